@@ -5,12 +5,14 @@ Preview a word on an Aleppo Codex page image for Job.
 Given a Hebrew word and a verse reference (c:v), this script:
 1. Looks up the word in line-break data (page, col, line-num)
 2. Gets pixel coordinates from column-coordinate data
-3. Downloads the page image from archive.org
+3. Downloads the page image from archive.org (or, with --jp2-zip, reads
+   it from a local copy of "Aleppo Codex_jp2.zip")
 4. Crops a generous region around the target line with a 2D fade overlay
 5. Generates an HTML preview page in .novc/ and opens it
 
 Usage:
     python main_preview_word_crops.py <hebrew_word> <chapter:verse>
+    python main_preview_word_crops.py <hebrew_word> <chapter:verse> --jp2-zip <zip>
 
 Example:
     python main_preview_word_crops.py "וְכִימֵ֖֗י" 7:1
@@ -31,15 +33,17 @@ sys.path.insert(0, str(ROOT))
 from py_ac_word_image_helper.codex_page import (
     CC_DIR,
     download_page,
-    find_page_for_verse,
+    find_pages_for_verse,
     get_line_bbox,
     load_index,
+    use_jp2_zip,
 )
 from py_ac_word_image_helper.hebrew_metrics import (
     SPACE_WIDTH,
     join_maqaf,
     line_widths,
 )
+from py_ac_word_image_helper.fuzzy_search import fuzzy_find
 from py_ac_word_image_helper.linebreak_search import find_word_in_linebreaks
 
 
@@ -49,7 +53,7 @@ def find_and_preview(word, cv, pages, scale=2):
     Args:
         word: Hebrew word to search for (with or without accents).
         cv: Verse reference, e.g. "7:1".
-        pages: Page index returned by load_index().
+        pages: Page index (CodexIndex) returned by load_index().
         scale: Image download scale factor.
 
     Returns a dict of result metadata, or None on failure.
@@ -58,15 +62,23 @@ def find_and_preview(word, cv, pages, scale=2):
 
     print(f"\n=== Job {cv}: {word} ===")
 
-    page_id = find_page_for_verse(pages, ch, v)
-    if not page_id:
+    candidates = find_pages_for_verse(pages, ch, v)
+    if not candidates:
         print(f"  ERROR: Could not find page for Job {cv}")
         return None
-    print(f"  Page: {page_id}")
 
-    col, line_num, word_idx, line_words = find_word_in_linebreaks(page_id, ch, v, word)
+    # A verse split by a page break is on two pages; try each.
+    for page_id in candidates:
+        col, line_num, word_idx, line_words = find_word_in_linebreaks(
+            page_id, ch, v, word
+        )
+        if col is not None:
+            break
+    print(f"  Page: {page_id}")
     if col is None:
         print(f"  ERROR: Could not find word in line-break data")
+        for dist, skeleton, locs in fuzzy_find(word, limit=5, verse_label=f"Job {cv}"):
+            print(f"  Did you mean {skeleton} (distance {dist}, page {locs[0][0]})?")
         return None
     print(f"  Location: col {col}, line {line_num}, word {word_idx + 1}")
     print(f"  Line: {' '.join(line_words)}")
@@ -304,13 +316,20 @@ function toggleRed() {{
 
 
 def main():
-    if len(sys.argv) != 3:
-        print("Usage: python main_preview_word_crops.py <hebrew_word> <chapter:verse>")
+    args = sys.argv[1:]
+    if len(args) == 4 and args[2] == "--jp2-zip":
+        use_jp2_zip(args[3])
+        args = args[:2]
+    if len(args) != 2:
+        print(
+            "Usage: python main_preview_word_crops.py <hebrew_word> <chapter:verse>"
+            " [--jp2-zip <zip>]"
+        )
         print("Example: python main_preview_word_crops.py <word> 7:1")
         sys.exit(1)
 
-    word = sys.argv[1]
-    cv = sys.argv[2]
+    word = args[0]
+    cv = args[1]
     if ":" not in cv:
         print(f"ERROR: verse must be in c:v format (e.g. 7:1), got: {cv}")
         sys.exit(1)
@@ -4,33 +4,44 @@ Stats reporter and consistency checker for line-break JSON files.
 Checks each file in py_ac_loc/line-breaks/*.json for structural
 consistency and reports summary statistics.
 
+Per-file results are cached in .novc/ by content hash, so only files
+that changed since the last run are re-checked (in parallel).
+
 Usage:
     python py_ac_loc/check_line_breaks.py          # check all files
     python py_ac_loc/check_line_breaks.py 270v      # check one file
+    python py_ac_loc/check_line_breaks.py --no-cache   # re-check everything
 """
 
-import json
+import hashlib
+import os
+import pickle
 import sys
 import webbrowser
-from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from py_ac_loc.gen_flat_stream import (
     load_index,
     build_flat_stream,
-    BOOK_XML,
+    get_verses_for_ranges,
     BOOK_END_SENTINEL,
     BOOK_START,
     MAM_XML_DIR,
 )
-from py_ac_loc.mam_xml_verses import get_verses_in_range
+from py_ac_loc.hebrew_norm import match_level
+from py_ac_loc.line_break_page import load_page
+from py_ac_loc.line_break_rules import EXPECTED_LINES_PER_COL, check_stream
+from py_ac_loc.word_align import align_pages
 
 PROJ_DIR = Path(__file__).resolve().parent.parent
 LB_DIR = PROJ_DIR / "py_ac_loc" / "line-breaks"
 OUT_DIR = PROJ_DIR / "py_ac_loc"
+CACHE_PATH = PROJ_DIR / ".novc" / "check-line-breaks-cache.pickle"
 
-EXPECTED_LINES_PER_COL = 28
+# Bump whenever a rule or the stats dict changes, to discard cached results.
+CHECKER_VERSION = 2
 
 # Book ordering for the poetic books in the Aleppo Codex.
 # Note: book order varies across manuscripts and printed editions;
@@ -53,11 +64,10 @@ def _get_mega_verses(start_ref, end_ref):
 
     si = BOOK_ORDER.index(start_book)
     ei = BOOK_ORDER.index(end_book)
-    all_verses = []
+    ranges = []
 
     for bi in range(si, ei + 1):
         book = BOOK_ORDER[bi]
-        xml_path = str(MAM_XML_DIR / BOOK_XML[book])
         if bi == si and bi == ei:
             # Same book
             s_cv = (start_ch, start_vs)
@@ -71,266 +81,178 @@ def _get_mega_verses(start_ref, end_ref):
         else:
             s_cv = BOOK_START
             e_cv = BOOK_END_SENTINEL
-        verses = get_verses_in_range(xml_path, book, s_cv, e_cv)
-        for v in verses:
-            v["book"] = book
-        all_verses.extend(verses)
+        ranges.append((book, s_cv, e_cv))
+
+    return [v for verses in get_verses_for_ranges(ranges) for v in verses]
+
+
+def _match_note(a, b):
+    """Describe how close two mismatched words are, e.g. " (same at nfc)"."""
+    level = match_level(a, b)
+    return f" (same at {level})" if level else ""
 
-    return all_verses
+
+def _describe_diff(d):
+    """Describe one word_align discrepancy as an issue string."""
+    where = f"col {d['col']} line {d['line']}"
+    jw = " ".join(d["json_words"])
+    mw = " ".join(d["mam_words"])
+    if d["tag"] == "delete":
+        what = f"extra JSON word(s) {jw!r} not in MAM-XML"
+    elif d["tag"] == "insert":
+        what = f"MAM-XML word(s) {mw!r} missing from JSON"
+    else:
+        what = f"JSON={jw!r} MAM={mw!r}" + _match_note(jw, mw)
+    return f"Cross-file word check ({where}): {what}"
 
 
 def load_stream(path):
-    return json.loads(path.read_text(encoding="utf-8"))
-
-
-def classify_item(item):
-    """Return a classification string for a stream item."""
-    if isinstance(item, str):
-        return "word"
-    if isinstance(item, dict):
-        for key in (
-            "page-start",
-            "page-end",
-            "verse-start",
-            "verse-end",
-            "verse-fragment-start",
-            "verse-fragment-end",
-            "line-start",
-            "line-end",
-            "parashah",
-        ):
-            if key in item:
-                return key
-        return f"unknown-dict({sorted(item.keys())})"
-    return f"unknown-type({type(item).__name__})"
-
-
-def check_file(path, verbose=True):
+    """Return the flat stream of a line-breaks file (shared; do not mutate)."""
+    return load_page(path).stream
+
+
+def check_file(path, verbose=True, rules=None):
     """Check a single line-break JSON file.
 
+    All checks are line_break_rules Rules run in one pass over the stream.
+
     Args:
         path: Path object pointing to a line-break JSON file.
         verbose: if True, print progress and issue details to stdout.
+        rules: Rule classes to run; defaults to line_break_rules.RULES.
 
     Returns:
-        List of issue description strings (empty if no problems found).
+        Stats dict for the file; its "issues" entry lists issue
+        description strings (empty if no problems found), and
+        "rule_times" maps each rule's class name to seconds spent.
     """
-    name = path.stem
-    stream = load_stream(path)
-    issues = []
-
-    # Classify all items
-    classes = Counter()
-    for item in stream:
-        classes[classify_item(item)] += 1
-
-    # --- Structural checks ---
-
-    # page-start / page-end
-    if classes["page-start"] != 1:
-        issues.append(f"Expected 1 page-start, found {classes['page-start']}")
-    if classes["page-end"] != 1:
-        issues.append(f"Expected 1 page-end, found {classes['page-end']}")
-
-    # Unknown types
-    for key, count in classes.items():
-        if key.startswith("unknown"):
-            issues.append(f"Unknown item type: {key} (×{count})")
-
-    # --- Line marker checks ---
-
-    # Every line-start has exactly one matching line-end and vice versa
-    line_start_counts = Counter()  # (col, line-num) -> count
-    line_end_counts = Counter()
-    line_starts = {}  # (col, line-num) -> last stream index (for ordering check)
-    line_ends = {}  # (col, line-num) -> last stream index
-    col_lines = {}  # col -> list of line-nums (from line-end markers)
-
-    for idx, item in enumerate(stream):
-        cls = classify_item(item)
-        if cls == "line-start":
-            info = item["line-start"]
-            key = (info["col"], info["line-num"])
-            line_start_counts[key] += 1
-            line_starts[key] = idx
-        elif cls == "line-end":
-            info = item["line-end"]
-            col = info["col"]
-            lnum = info["line-num"]
-            key = (col, lnum)
-            line_end_counts[key] += 1
-            line_ends[key] = idx
-            if col not in col_lines:
-                col_lines[col] = []
-            col_lines[col].append(lnum)
-
-    all_keys = sorted(set(line_start_counts) | set(line_end_counts))
-    for key in all_keys:
-        sc = line_start_counts[key]
-        ec = line_end_counts[key]
-        if sc == 0:
-            issues.append(
-                f"line-end(col={key[0]}, num={key[1]}) with no matching line-start"
-            )
-        elif sc > 1:
-            issues.append(
-                f"line-start(col={key[0]}, num={key[1]}) appears {sc} times (expected 1)"
-            )
-        if ec == 0:
-            issues.append(
-                f"line-start(col={key[0]}, num={key[1]}) with no matching line-end"
-            )
-        elif ec > 1:
-            issues.append(
-                f"line-end(col={key[0]}, num={key[1]}) appears {ec} times (expected 1)"
-            )
-
-    # Reversed-order pairs (line-end before line-start) must be truly
-    # empty (no words between them)
-    empty_lines = []
-    matched_keys = sorted(set(line_starts) & set(line_ends))
-    for key in matched_keys:
-        s_idx = line_starts[key]
-        e_idx = line_ends[key]
-        if e_idx < s_idx:
-            words_between = [
-                stream[i]
-                for i in range(e_idx + 1, s_idx)
-                if classify_item(stream[i]) == "word"
-            ]
-            if words_between:
-                issues.append(
-                    f"line-end(col={key[0]}, num={key[1]}) comes before "
-                    f"line-start but {len(words_between)} word(s) between them"
-                )
-            else:
-                empty_lines.append(key)
-
-    # N lines per column, numbered sequentially 1..N
-    for col in sorted(col_lines.keys()):
-        nums = col_lines[col]
-        n = len(nums)
-        if n != EXPECTED_LINES_PER_COL:
-            issues.append(f"Col {col}: {n} lines (expected {EXPECTED_LINES_PER_COL})")
-        expected_nums = list(range(1, n + 1))
-        if nums != expected_nums:
-            issues.append(
-                f"Col {col}: line numbers are {nums}, " f"expected {expected_nums}"
-            )
-
-    # No words before first line-start or after last line-end
-    first_ls = next(
-        (i for i, x in enumerate(stream) if classify_item(x) == "line-start"),
-        None,
-    )
-    if first_ls is not None:
-        pre_words = [i for i in range(first_ls) if classify_item(stream[i]) == "word"]
-        if pre_words:
-            issues.append(f"{len(pre_words)} word(s) before first line-start")
-
-    last_le = None
-    for i, x in enumerate(stream):
-        if classify_item(x) == "line-end":
-            last_le = i
-    if last_le is not None:
-        post_words = [
-            i
-            for i in range(last_le + 1, len(stream))
-            if classify_item(stream[i]) == "word"
-        ]
-        if post_words:
-            issues.append(f"{len(post_words)} word(s) after last line-end")
-
-    # Both columns present (structural, but depends on col_lines built above)
-    if 1 not in col_lines:
-        issues.append("No col 1 line markers")
-    if 2 not in col_lines:
-        issues.append("No col 2 line markers")
-
-    # --- Verse marker checks ---
-
-    # All verse identifiers are well-formed (Book C:V)
-    for item in stream:
-        if isinstance(item, dict):
-            for key in (
-                "verse-start",
-                "verse-fragment-start",
-                "verse-end",
-                "verse-fragment-end",
-            ):
-                if key in item:
-                    vs = item[key]
-                    parts = vs.rsplit(" ", 1)
-                    if len(parts) != 2 or ":" not in parts[1]:
-                        issues.append(f"Malformed {key}: {vs!r}")
-
-    # Every verse-start has exactly one matching verse-end or verse-fragment-end
-    start_counts = Counter()  # counts of verse-end/verse-fragment-end per verse ID
-    end_counts = Counter()  # counts of verse-start/verse-fragment-start per verse ID
-    file_verse_starts = set()
-    file_verse_ends = set()
-    for item in stream:
-        if isinstance(item, dict):
-            if "verse-start" in item:
-                file_verse_starts.add(item["verse-start"])
-                end_counts[item["verse-start"]] += 1
-            if "verse-fragment-start" in item:
-                end_counts[item["verse-fragment-start"]] += 1
-            if "verse-end" in item:
-                file_verse_ends.add(item["verse-end"])
-                start_counts[item["verse-end"]] += 1
-            if "verse-fragment-end" in item:
-                start_counts[item["verse-fragment-end"]] += 1
-
-    for v in sorted(file_verse_starts):
-        n = start_counts[v]
-        if n == 0:
-            issues.append(
-                f"verse-start {v} has no matching verse-end or verse-fragment-end"
-            )
-        elif n > 1:
-            issues.append(
-                f"verse-start {v} has {n} matching verse-end/verse-fragment-end markers (expected 1)"
-            )
-
-    # Every verse-end has exactly one matching verse-start or verse-fragment-start
-    for v in sorted(file_verse_ends):
-        n = end_counts[v]
-        if n == 0:
-            issues.append(
-                f"verse-end {v} has no matching verse-start or verse-fragment-start"
-            )
-        elif n > 1:
-            issues.append(
-                f"verse-end {v} has {n} matching verse-start/verse-fragment-start markers (expected 1)"
-            )
-
-    # --- Word count ---
-    word_count = classes.get("word", 0)
+    page = load_page(path)
+    issues, rule_stats, finished = check_stream(page.stream, rules)
+    classes = rule_stats["classes"]
 
     # --- Build stats dict ---
     stats = {
-        "name": name,
-        "words": word_count,
-        "col_lines": {col: len(nums) for col, nums in sorted(col_lines.items())},
+        "name": path.stem,
+        "words": rule_stats["words"],
+        "col_lines": rule_stats.get("col_lines", {}),
         "verse_starts": classes.get("verse-start", 0),
         "verse_ends": classes.get("verse-end", 0),
         "frag_starts": classes.get("verse-fragment-start", 0),
         "frag_ends": classes.get("verse-fragment-end", 0),
         "parashahs": classes.get("parashah", 0),
-        "empty_lines": empty_lines,
-        "file_verse_starts": file_verse_starts,
-        "file_verse_ends": file_verse_ends,
+        "empty_lines": rule_stats.get("empty_lines", []),
+        "file_verse_starts": rule_stats.get("file_verse_starts", set()),
+        "file_verse_ends": rule_stats.get("file_verse_ends", set()),
         "issues": issues,
+        "rule_times": {type(r).__name__: r.elapsed for r in finished},
+        "word_list": page.words,
+        "word_locs": [
+            (line.col, line.num) if line else (None, None)
+            for line in (
+                page.line_of_token(i)
+                for i, t in enumerate(page.tokens)
+                if not t.is_parashah
+            )
+        ],
     }
 
     return stats
 
 
+# (stamp, files) of CACHE_PATH as last read or written by this process,
+# so a long-running caller (watch_line_breaks) does not unpickle it again
+# unless another process has rewritten it.
+_cache = None
+
+
+def _cache_stamp():
+    try:
+        st = CACHE_PATH.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _read_cache():
+    global _cache
+    stamp = _cache_stamp()
+    if _cache is not None and stamp is not None and _cache[0] == stamp:
+        return _cache[1]
+    try:
+        with open(CACHE_PATH, "rb") as f:
+            data = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return {}
+    if data.get("version") != CHECKER_VERSION:
+        return {}
+    _cache = (stamp, data["files"])
+    return data["files"]
+
+
+def _write_cache(files):
+    global _cache
+    CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = CACHE_PATH.with_name(f"{CACHE_PATH.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        payload = {"version": CHECKER_VERSION, "files": files}
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, CACHE_PATH)
+    _cache = (_cache_stamp(), files)
+
+
+def check_files(paths, use_cache=True, max_workers=None):
+    """Check several line-break files, re-checking only changed ones.
+
+    Per-file stats are cached in CACHE_PATH, keyed by the file's sha256
+    and CHECKER_VERSION. Files without a valid cached result are checked
+    in a process pool (inline if only one).
+
+    Args:
+        paths: Paths of line-break JSON files.
+        use_cache: if False, check every file and leave the cache alone.
+        max_workers: process count for the pool.
+
+    Returns:
+        (list of stats dicts in *paths* order, number of files checked).
+    """
+    cached = _read_cache() if use_cache else {}
+    hashes = [hashlib.sha256(p.read_bytes()).hexdigest() for p in paths]
+    results = {}
+    todo = []
+    for path, sha in zip(paths, hashes):
+        hit = cached.get(path.name)
+        if hit is not None and hit["sha256"] == sha:
+            results[path] = hit["stats"]
+        else:
+            todo.append(path)
+
+    if len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results.update(zip(todo, pool.map(check_file, todo)))
+    else:
+        results.update((path, check_file(path)) for path in todo)
+
+    for path, sha in zip(paths, hashes):
+        results[path]["sha256"] = sha
+    if use_cache and todo:
+        for path, sha in zip(paths, hashes):
+            cached[path.name] = {"sha256": sha, "stats": results[path]}
+        _write_cache(cached)
+    # The cached stats may stay in memory (see _read_cache): hand out
+    # copies whose issue lists run_check can extend.
+    stats = [
+        dict(results[path], issues=list(results[path]["issues"])) for path in paths
+    ]
+    return stats, len(todo)
+
+
 def main():
+    args = sys.argv[1:]
+    use_cache = "--no-cache" not in args
+    pages = [a for a in args if not a.startswith("--")]
+
     # Determine which files to check
-    if len(sys.argv) > 1:
-        pages = sys.argv[1:]
+    if pages:
         paths = []
         for p in pages:
             path = LB_DIR / f"{p}.json"
@@ -345,13 +267,27 @@ def main():
         print("No JSON files found in", LB_DIR)
         sys.exit(1)
 
-    all_stats = []
-    total_issues = 0
+    passed = run_check(paths, use_cache=use_cache)
+    sys.exit(0 if passed else 1)
+
+
+def run_check(paths, use_cache=True, open_browser=True):
+    """Check files, run the cross-file checks and write the HTML report.
+
+    Args:
+        paths: Paths of line-break JSON files, in codex order.
+        use_cache: if False, ignore (and do not update) cached results.
+        open_browser: if True, open the report in a web browser.
 
-    for path in paths:
-        stats = check_file(path)
-        all_stats.append(stats)
-        total_issues += len(stats["issues"])
+    Returns:
+        True if no issues were found.
+    """
+    all_stats, n_checked = check_files(paths, use_cache=use_cache)
+    print(
+        f"Checked {n_checked} of {len(paths)} file(s) "
+        f"({len(paths) - n_checked} unchanged, from cache)"
+    )
+    total_issues = sum(len(s["issues"]) for s in all_stats)
 
     # --- Cross-file duplicate verse check ---
     # Each full verse-start and each full verse-end should
@@ -382,87 +318,47 @@ def main():
                     break
 
     # --- Cross-file word sequence check (MAM-XML ground truth) ---
-    # Build the expected word sequence from MAM-XML for the full page range,
-    # then verify that the concatenated JSON words match a contiguous slice.
+    # Align the concatenated JSON words of all files against the MAM-XML
+    # word sequence for the full page range; every extra, missing or
+    # substituted word is reported on the page/line where it occurs.
     if len(paths) > 1:
         index = load_index()
-        first_page = all_stats[0]["name"]
-        last_page = all_stats[-1]["name"]
-        first_range = index[first_page]
-        last_range = index[last_page]
-        # Get all verses from MAM-XML spanning the full range
-        mega_verses = _get_mega_verses(first_range[0], last_range[1])
-        mega_stream = build_flat_stream("_mega_", mega_verses)
-        mam_words = [x for x in mega_stream if isinstance(x, str)]
-
-        # Concatenate JSON words from all files in order
-        json_words = []
-        for path in paths:
-            stream = load_stream(path)
-            json_words.extend(x for x in stream if isinstance(x, str))
-
-        # JSON words should appear as a contiguous subsequence of MAM words
-        # (MAM may have extra words at start/end due to whole-verse extraction)
-        if json_words:
-            # Find where json_words[0] first appears in mam_words
-            match_start = None
-            for i in range(len(mam_words) - len(json_words) + 1):
-                if mam_words[i] == json_words[0]:
-                    match_start = i
-                    break
-            if match_start is None:
-                msg = (
-                    f"Cross-file word check: first JSON word "
-                    f"{json_words[0]!r} not found in MAM-XML stream"
-                )
-                total_issues += 1
-                all_stats[0]["issues"].append(msg)
-            else:
-                mam_slice = mam_words[match_start : match_start + len(json_words)]
-                if len(mam_slice) < len(json_words):
-                    msg = (
-                        f"Cross-file word check: JSON has {len(json_words)} words "
-                        f"but only {len(mam_words) - match_start} remain in MAM-XML "
-                        f"from match position"
-                    )
-                    total_issues += 1
-                    all_stats[-1]["issues"].append(msg)
-                else:
-                    # Compare word by word
-                    mismatches = []
-                    for j, (jw, mw) in enumerate(zip(json_words, mam_slice)):
-                        if jw != mw:
-                            mismatches.append((j, jw, mw))
-                            if len(mismatches) >= 5:
-                                break
-                    if mismatches:
-                        # Find which page the first mismatch falls in
-                        words_so_far = 0
-                        mismatch_idx = mismatches[0][0]
-                        blame_stat = all_stats[0]
-                        for s in all_stats:
-                            if words_so_far + s["words"] > mismatch_idx:
-                                blame_stat = s
-                                break
-                            words_so_far += s["words"]
-                        detail = "; ".join(
-                            f"word {j}: JSON={jw!r} MAM={mw!r}"
-                            for j, jw, mw in mismatches
-                        )
-                        msg = (
-                            f"Cross-file word check: {len(mismatches)} mismatch(es) "
-                            f"vs MAM-XML: {detail}"
-                        )
-                        total_issues += 1
-                        blame_stat["issues"].append(msg)
+        first_range = index[all_stats[0]["name"]]
+        last_range = index[all_stats[-1]["name"]]
+        mam_key = (
+            first_range[0],
+            last_range[1],
+            sorted((p.name, p.stat().st_mtime_ns) for p in MAM_XML_DIR.glob("*.xml")),
+        )
+
+        def load_mam_words():
+            # Get all verses from MAM-XML spanning the full range
+            mega_verses = _get_mega_verses(first_range[0], last_range[1])
+            mega_stream = build_flat_stream("_mega_", mega_verses)
+            return [x for x in mega_stream if isinstance(x, str)]
+
+        pages = [
+            {
+                "name": s["name"],
+                "sha256": s["sha256"],
+                "words": s["word_list"],
+                "locs": s["word_locs"],
+            }
+            for s in all_stats
+        ]
+        diffs, n_realigned = align_pages(
+            pages, mam_key, load_mam_words, use_cache=use_cache
+        )
+        print(f"Re-aligned {n_realigned} of {len(pages)} page(s) against MAM-XML")
+        stats_by_name = {s["name"]: s for s in all_stats}
+        for d in diffs:
+            total_issues += 1
+            stats_by_name[d["page"]]["issues"].append(_describe_diff(d))
 
     # --- Collect unique verse-start values ---
     all_verses = set()
-    for path in paths:
-        stream = load_stream(path)
-        for item in stream:
-            if isinstance(item, dict) and "verse-start" in item:
-                all_verses.add(item["verse-start"])
+    for s in all_stats:
+        all_verses.update(s["file_verse_starts"])
 
     # --- Collect empty lines ---
     all_empty = []
@@ -634,9 +530,10 @@ def main():
     out_path = OUT_DIR / "check_line_breaks.html"
     out_path.write_text(html, encoding="utf-8")
     print(f"Report written to {out_path}")
-    webbrowser.open(out_path.as_uri())
+    if open_browser:
+        webbrowser.open(out_path.as_uri())
 
-    sys.exit(0 if passed else 1)
+    return passed
 
 
 if __name__ == "__main__":
@@ -0,0 +1,177 @@
+"""
+Check prefetch_images against a local HTTP stand-in for archive.org.
+
+Starts an http.server on 127.0.0.1 that serves a small fixture JPEG per
+leaf behind a redirect (as archive.org's BookReader redirects to a data
+node), answers one leaf's first request with 503 and another's with
+429, then prefetches into a temporary image store and checks that:
+
+  - every leaf is stored, byte for byte, and nothing failed;
+  - the 503 and 429 leaves were retried exactly once;
+  - each worker kept one keep-alive connection (no more connections
+    than workers, though requests span redirects and retries);
+  - the requests were spread out by the rate limit;
+  - a second run finds everything cached and makes no requests.
+
+Needs no network access and leaves the shared image store alone.
+
+Usage:
+    python py_ac_loc/check_prefetch_images.py
+"""
+
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from py_ac_loc import prefetch_images
+from py_ac_loc.image_store import ImageStore
+
+PAGES = ["270r", "270v", "271r", "271v", "272r", "272v", "273r", "273v"]
+FAIL_ONCE = {"271r": 503, "272v": 429}  # leaf -> status of its first request
+WORKERS = 3
+RATE = 20.0  # requests per second
+BACKOFF_BASE = 0.05  # seconds; keeps the retries quick
+
+
+def fixture_jpeg(page_id):
+    """A minimal JPEG-framed fixture (SOI, comment naming the leaf, EOI).
+
+    The prefetcher never decodes images, so only the bytes matter; the
+    comment makes each leaf's content (and so its store object) distinct.
+    """
+    comment = f"fixture {page_id}".encode("ascii")
+    return (
+        b"\xff\xd8"
+        + b"\xff\xfe"
+        + (len(comment) + 2).to_bytes(2, "big")
+        + comment
+        + b"\xff\xd9"
+    )
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Local server recording requests, their times and client connections."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.lock = threading.Lock()
+        self.hits = Counter()  # path -> number of requests
+        self.times = []  # monotonic time of each request
+        self.connections = set()  # client (host, port) pairs
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body=b"", headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        srv = self.server
+        with srv.lock:
+            srv.hits[self.path] += 1
+            srv.times.append(time.monotonic())
+            srv.connections.add(self.client_address)
+            n = srv.hits[self.path]
+        kind, _, page_id = self.path.strip("/").partition("/")
+        if kind == "redirect":
+            self._reply(302, headers=[("Location", f"/img/{page_id}")])
+        elif kind == "img" and page_id in FAIL_ONCE and n == 1:
+            self._reply(FAIL_ONCE[page_id])
+        elif kind == "img" and page_id in PAGES:
+            self._reply(200, fixture_jpeg(page_id), [("Content-Type", "image/jpeg")])
+        else:
+            self._reply(404)
+
+
+def run_checks():
+    """Run the prefetcher against the stand-in; return a list of failures."""
+    failures = []
+
+    def check(ok, message):
+        print(f"  {'ok  ' if ok else 'FAIL'} {message}")
+        if not ok:
+            failures.append(message)
+
+    srv = StandInServer()
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    url_template = f"http://127.0.0.1:{srv.server_port}/redirect/{{page_id}}"
+    backoff_base = prefetch_images.BACKOFF_BASE
+    prefetch_images.BACKOFF_BASE = BACKOFF_BASE
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            store = ImageStore(root)
+            downloaded, failed = prefetch_images.prefetch(
+                PAGES,
+                max_workers=WORKERS,
+                rate=RATE,
+                url_template=url_template,
+                store=store,
+            )
+            print()
+            check(not failed, f"failed leaves: {failed}")
+            check(sorted(downloaded) == sorted(PAGES), "every leaf downloaded")
+            check(
+                all(store.get_bytes(p) == fixture_jpeg(p) for p in PAGES),
+                "stored bytes match the served fixtures",
+            )
+            for page_id, status in FAIL_ONCE.items():
+                n = srv.hits[f"/img/{page_id}"]
+                check(n == 2, f"{page_id}: HTTP {status} retried once ({n} requests)")
+
+            n_requests = len(srv.times)
+            check(
+                len(srv.connections) <= WORKERS,
+                f"{n_requests} requests over {len(srv.connections)} keep-alive "
+                f"connection(s), {WORKERS} workers",
+            )
+            # The token bucket starts with one token: n requests take at
+            # least (n - 1) / RATE seconds (a little slack for the clock).
+            span = max(srv.times) - min(srv.times)
+            min_span = (n_requests - 1) / RATE * 0.9
+            check(
+                span >= min_span,
+                f"rate limit: {n_requests} requests in {span:.2f}s "
+                f"(>= {min_span:.2f}s at {RATE:g}/s)",
+            )
+
+            downloaded, failed = prefetch_images.prefetch(
+                PAGES, url_template=url_template, store=store
+            )
+            check(
+                not downloaded and not failed and len(srv.times) == n_requests,
+                "second run: everything cached, no requests",
+            )
+    finally:
+        prefetch_images.BACKOFF_BASE = backoff_base
+        srv.shutdown()
+        srv.server_close()
+    return failures
+
+
+def main():
+    print(f"Prefetching {len(PAGES)} leaves from a local stand-in server")
+    failures = run_checks()
+    if failures:
+        print(f"\n{len(failures)} check(s) failed")
+        sys.exit(1)
+    print("\nAll checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Check word_align's alignments against a plain dynamic-programming one.
+
+  - a boundary word that also occurs further into the free MAM words is
+    not anchored at the front (or back): a correct page run aligns with
+    no discrepancies, through diff_opcodes and align_pages;
+  - on random short sequences, diff_opcodes finds an edit script of
+    minimal cost (inserted plus deleted words) with and without free
+    ends, and its opcodes are consistent with both sequences.
+
+Usage:
+    python py_ac_loc/check_word_align.py
+"""
+
+import random
+import sys
+from itertools import product
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from py_ac_loc.word_align import align_pages, diff_opcodes
+
+N_RANDOM = 2000  # random sequence pairs per free-end setting
+
+
+def dp_cost(a, b, free_start, free_end):
+    """Minimal number of inserted plus deleted words, by plain DP."""
+    prev = [0 if free_start else j for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        row = [i]
+        for j in range(1, len(b) + 1):
+            best = min(prev[j], row[j - 1]) + 1
+            if a[i - 1] == b[j - 1]:
+                best = min(best, prev[j - 1])
+            row.append(best)
+        prev = row
+    return min(prev) if free_end else prev[-1]
+
+
+def script_problem(ops, a, b, free_start, free_end):
+    """Return what is wrong with opcodes *ops* for a -> b, or None."""
+    i = 0
+    j = ops[0][3] if ops else 0
+    if ops and not free_start and j != 0:
+        return "skips leading b words"
+    for tag, i1, i2, j1, j2 in ops:
+        if (i1, j1) != (i, j):
+            return f"gap before {(tag, i1, i2, j1, j2)}"
+        if tag == "equal" and a[i1:i2] != b[j1:j2]:
+            return f"unequal {(tag, i1, i2, j1, j2)}"
+        i, j = i2, j2
+    if i != len(a):
+        return "does not cover a"
+    if ops and not free_end and j != len(b):
+        return "skips trailing b words"
+    return None
+
+
+def run_checks():
+    """Run all checks; return a list of failures."""
+    failures = []
+
+    def check(ok, message):
+        print(f"  {'ok  ' if ok else 'FAIL'} {message}")
+        if not ok:
+            failures.append(message)
+
+    ops = diff_opcodes(list("XYZ"), list("XWXYZ"), True, True)
+    check(
+        ops == [("equal", 0, 3, 2, 5)], f"free start: X not anchored at the front {ops}"
+    )
+    ops = diff_opcodes(list("XYZ"), list("XYZWZ"), True, True)
+    check(ops == [("equal", 0, 3, 0, 3)], f"free end: Z not anchored at the back {ops}")
+    ops = diff_opcodes(list("XYZ"), list("XWXYZ"))
+    check(len(ops) == 3, f"fixed ends still cover every word: {ops}")
+
+    pages = [
+        {"name": "p1", "sha256": "1", "words": ["X", "Y"], "locs": [(1, 1)] * 2},
+        {"name": "p2", "sha256": "2", "words": ["Z"], "locs": [(1, 1)]},
+    ]
+    discrepancies, _ = align_pages(
+        pages, None, lambda: ["X", "W", "X", "Y", "Z", "W"], use_cache=False
+    )
+    check(not discrepancies, f"align_pages: no discrepancies {discrepancies}")
+
+    rng = random.Random(0)
+    for free_start, free_end in product((False, True), repeat=2):
+        bad = None
+        for _ in range(N_RANDOM):
+            a = rng.choices("ABC", k=rng.randint(0, 8))
+            b = rng.choices("ABC", k=rng.randint(0, 10))
+            ops = diff_opcodes(a, b, free_start, free_end)
+            cost = sum(i2 - i1 + j2 - j1 for t, i1, i2, j1, j2 in ops if t != "equal")
+            problem = script_problem(ops, a, b, free_start, free_end)
+            if problem is None and cost != dp_cost(a, b, free_start, free_end):
+                problem = f"cost {cost}, minimum {dp_cost(a, b, free_start, free_end)}"
+            if problem:
+                bad = f"{''.join(a)} -> {''.join(b)}: {problem}"
+                break
+        check(
+            bad is None,
+            f"free_start={free_start}, free_end={free_end}: "
+            f"{N_RANDOM} random pairs minimal{f' ({bad})' if bad else ''}",
+        )
+    return failures
+
+
+def main():
+    print("Checking word_align")
+    failures = run_checks()
+    if failures:
+        print(f"\n{len(failures)} check(s) failed")
+        sys.exit(1)
+    print("\nAll checks passed")
+
+
+if __name__ == "__main__":
+    main()
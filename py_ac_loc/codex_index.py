@@ -0,0 +1,157 @@
+"""
+Interval index over codex-index/index-flat.json.
+
+Each of the index's rows gives a leaf (e.g. "270r") and the inclusive
+range of verses it covers, [[book, ch, vs], [book, ch, vs]]. Rows are in
+codex order, and a verse that straddles a page break is the end of one
+leaf's range and the start of the next. Mapping every verse reference to
+a key (position of its book in the header's codex-order book list,
+chapter, verse) turns the rows into sorted, non-overlapping (except at
+shared boundary verses) intervals, so both directions of lookup are a
+bisect:
+
+    index = load_codex_index()
+    index.leaves_for_verse("Job", 37, 9)    # -> ["279v", "280r"]
+    index.leaf_range("270r")                # -> (["Ps", 149, 1], ["Job", 1, 16])
+
+Book names are as in index-flat.json ("Job", "1 Chron", ...).
+
+load_codex_index() is the one loader every tool should use. It decodes
+the JSON at most once per process, and keeps a pickled CodexIndex in
+.novc/codex-index.pickle (revalidated by the JSON file's mtime and
+size) so that later CLI runs skip JSON decoding entirely.
+"""
+
+import bisect
+import json
+import os
+import pickle
+from pathlib import Path
+
+INDEX_PATH = Path(__file__).resolve().parent / "codex-index" / "index-flat.json"
+CACHE_PATH = Path(__file__).resolve().parent.parent / ".novc" / "codex-index.pickle"
+
+# Bump when CodexIndex's attributes change, to ignore old pickles.
+CACHE_VERSION = 1
+
+_memo = None  # (stat key, CodexIndex) for this process
+
+
+class CodexIndex:
+    """Leaf <-> verse interval index built from parsed index-flat.json data."""
+
+    def __init__(self, data):
+        """
+        Args:
+            data: the parsed contents of index-flat.json (a dict with
+                "header" and "body").
+        """
+        self.books = list(data["header"]["books"])  # codex order
+        self._book_pos = {book: i for i, book in enumerate(self.books)}
+        self.leaves = []  # codex order
+        self.leaf_ranges = {}  # leaf -> de_text_range
+        self._starts = []  # verse key of each row's first verse
+        self._ends = []  # verse key of each row's last verse
+        for row in data["body"]:
+            leaf = row["de_leaf"]
+            tr = row["de_text_range"]
+            self.leaves.append(leaf)
+            self.leaf_ranges[leaf] = tr
+            self._starts.append(self.verse_key(*tr[0]))
+            self._ends.append(self.verse_key(*tr[1]))
+        self._leaf_pos = {leaf: i for i, leaf in enumerate(self.leaves)}
+
+    @property
+    def intervals(self):
+        """List of (leaf, start_ref, end_ref) in codex order."""
+        return [(leaf, *self.leaf_ranges[leaf]) for leaf in self.leaves]
+
+    def verse_key(self, book, ch, vs):
+        """Sortable key for a verse reference, in codex order."""
+        return (self._book_pos[book], ch, vs)
+
+    def leaves_for_verse(self, book, ch, vs):
+        """Return the leaves whose text range contains a verse, in codex order.
+
+        A verse that straddles a page break is on two (rarely more)
+        leaves. Returns [] for unknown books and for verses in gaps (lost
+        leaves).
+        """
+        if book not in self._book_pos:
+            return []
+        key = self.verse_key(book, ch, vs)
+        # Rows are sorted by start and by end, so the rows containing
+        # key are a contiguous run ending at the last row starting <= key.
+        i = bisect.bisect_right(self._starts, key)
+        j = i
+        while j > 0 and self._ends[j - 1] >= key:
+            j -= 1
+        return self.leaves[j:i]
+
+    def find_leaf_for_verse(self, book, ch, vs):
+        """Return a single leaf for a verse, or None.
+
+        For a verse that straddles a page break, prefers the leaf on
+        which the verse does not end (the later one), matching the
+        historical codex_page.find_page_for_verse behaviour.
+        """
+        leaves = self.leaves_for_verse(book, ch, vs)
+        key = self.verse_key(book, ch, vs) if leaves else None
+        for leaf in leaves:
+            if key < self._ends[self._leaf_pos[leaf]]:
+                return leaf
+        return leaves[0] if leaves else None
+
+    def leaf_range(self, leaf):
+        """Return the ([book, ch, vs], [book, ch, vs]) range covered by *leaf*."""
+        tr = self.leaf_ranges[leaf]
+        return tr[0], tr[1]
+
+    def leaves_in_range(self, start_ref, end_ref):
+        """Return the leaves overlapping an inclusive verse range, in codex order.
+
+        Args:
+            start_ref: [book, ch, vs] of the first verse.
+            end_ref: [book, ch, vs] of the last verse.
+        """
+        lo = bisect.bisect_left(self._ends, self.verse_key(*start_ref))
+        hi = bisect.bisect_right(self._starts, self.verse_key(*end_ref))
+        return self.leaves[lo:hi]
+
+
+def _read_cache(stat_key):
+    try:
+        with open(CACHE_PATH, "rb") as f:
+            data = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    if data.get("version") != CACHE_VERSION or data.get("source") != stat_key:
+        return None
+    return data["index"]
+
+
+def _write_cache(stat_key, index):
+    CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = CACHE_PATH.with_name(f"{CACHE_PATH.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        payload = {"version": CACHE_VERSION, "source": stat_key, "index": index}
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, CACHE_PATH)
+
+
+def load_codex_index():
+    """Return the shared CodexIndex, loading it at most once per process.
+
+    The returned object is shared; callers must not mutate it.
+    """
+    global _memo
+    st = INDEX_PATH.stat()
+    stat_key = (st.st_mtime_ns, st.st_size)
+    if _memo is not None and _memo[0] == stat_key:
+        return _memo[1]
+    index = _read_cache(stat_key)
+    if index is None:
+        index = CodexIndex(json.loads(INDEX_PATH.read_text(encoding="utf-8")))
+        _write_cache(stat_key, index)
+    _memo = (stat_key, index)
+    return index
@@ -15,6 +15,9 @@ import sys
 import webbrowser
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from py_ac_loc.image_store import image_url, local_image_url
+
 BASE = Path(__file__).resolve().parent.parent
 OUT_DIR = BASE / ".novc"
 COORD_DIR = Path(__file__).resolve().parent / "column-coordinates"
@@ -63,28 +66,19 @@ def _load_defaults(page_id):
     return _FALLBACK_DEFAULTS, False
 
 
-def _leaf_to_page_n(page_id):
-    """Convert a leaf ID like '270r' to the archive.org 0-based page index."""
-    num = int(page_id[:-1])
-    side = page_id[-1]
-    return (num - 1) * 2 + 2 + (0 if side == "r" else 1)
-
-
-def _image_url(page_id):
-    """Build archive.org direct image URL for an Aleppo Codex page."""
-    n = _leaf_to_page_n(page_id)
-    return (
-        "https://ia601801.us.archive.org/BookReader/BookReaderImages.php"
-        f"?zip=/7/items/aleppo-codex/Aleppo%20Codex_jp2.zip"
-        f"&file=Aleppo%20Codex_jp2/Aleppo%20Codex_{n:04d}.jp2"
-        f"&id=aleppo-codex&scale=2&rotate=0"
-    )
+def generate_editor(page_id, open_browser=True):
+    """Generate the HTML column-location editor for a page.
 
+    Args:
+        page_id: leaf identifier, e.g. "270r".
+        open_browser: if True, open the editor in a web browser.
 
-def generate_editor(page_id):
-    """Generate the HTML column-location editor for a page."""
+    Returns:
+        Path of the written HTML file.
+    """
 
-    img_url = _image_url(page_id)
+    img_src = local_image_url(page_id, OUT_DIR)
+    img_fallback = image_url(page_id, scale=2)
     defaults, from_file = _load_defaults(page_id)
     c1 = defaults["col1"]
     c2 = defaults["col2"]
@@ -199,7 +193,8 @@ def generate_editor(page_id):
 
 <div id="container">
   <div id="page-wrapper">
-    <img id="page-img" src="{img_url}" alt="Codex page {page_id}">
+    <img id="page-img" src="{img_src}" alt="Codex page {page_id}"
+         onerror="this.onerror=null; this.src='{img_fallback}'">
     <div id="overlay">
       <svg id="overlay-svg" viewBox="0 0 1000 1000" preserveAspectRatio="none">
       </svg>
@@ -691,7 +686,9 @@ document.getElementById('page-img').addEventListener('load', () => {{
     out_path = OUT_DIR / f"col_editor_{page_id}.html"
     out_path.write_text(html, encoding="utf-8")
     print(f"Editor written to {out_path}")
-    webbrowser.open(out_path.as_uri())
+    if open_browser:
+        webbrowser.open(out_path.as_uri())
+    return out_path
 
 
 def main():
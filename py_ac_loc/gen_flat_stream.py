@@ -19,16 +19,16 @@ Usage:
 
 import json
 import sys
-import unicodedata
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
-from py_ac_loc.mam_xml_verses import get_verses_in_range
+from py_ac_loc.codex_index import load_codex_index
+from py_ac_loc.mam_xml_verses import get_verses_in_ranges
+from py_ac_loc.mark_order import assert_standard_order
 
 BASE = Path(__file__).resolve().parent.parent
 AC_DIR = BASE / "py_ac_loc"
 MAM_XML_DIR = AC_DIR / "MAM-XML"
-INDEX_PATH = AC_DIR / "codex-index" / "index-flat.json"
 OUT_DIR = AC_DIR / "ds-flat-stream"
 
 BOOK_XML = {
@@ -57,131 +57,93 @@ BOOK_START = (1, 1)
 
 
 def load_index():
-    """Load the codex-index and return a dict: leaf -> de_text_range."""
-    data = json.loads(INDEX_PATH.read_text(encoding="utf-8"))
-    result = {}
-    for row in data["body"]:
-        result[row["de_leaf"]] = row["de_text_range"]
-    return result
+    """Load the codex-index and return a dict: leaf -> de_text_range.
 
+    The dict is the shared one from codex_index.load_codex_index();
+    callers must not mutate it.
+    """
+    return load_codex_index().leaf_ranges
 
-def get_page_verses(text_range):
-    """Fetch all verses for a page from MAM-XML, handling cross-book pages.
+
+def get_verses_for_ranges(ranges):
+    """Fetch verses for many (book, start_cv, end_cv) ranges at once.
+
+    Each MAM-XML book is read once, however many ranges touch it.
 
     Args:
-        text_range: [[book, ch, vs], [book, ch, vs]] pair from
-            index-flat.json, giving the start and end of the page’s
-            text coverage.
+        ranges: list of (book, start_cv, end_cv), with book a key of
+            BOOK_XML and the cv values (chapter, verse) tuples, inclusive.
 
     Returns:
-        List of verse dicts, each with keys: book, cv, words,
-        ketiv_indices, parashah_after.
+        One verse list per range, in request order. Each verse dict has
+        keys: book, cv, words, ketiv_indices, parashah_before.
+    """
+    results = get_verses_in_ranges(
+        (str(MAM_XML_DIR / BOOK_XML[book]), book, s_cv, e_cv)
+        for book, s_cv, e_cv in ranges
+    )
+    for (book, _, _), verses in zip(ranges, results):
+        for v in verses:
+            v["book"] = book
+    return results
+
+
+def _page_ranges(text_range):
+    """Split a page's text range into per-book (book, start_cv, end_cv) ranges.
+
+    Args:
+        text_range: [[book, ch, vs], [book, ch, vs]] pair from
+            index-flat.json.
     """
     start_book, start_ch, start_vs = text_range[0]
     end_book, end_ch, end_vs = text_range[1]
 
     if start_book == end_book:
         # Same book — simple case
-        xml_path = str(MAM_XML_DIR / BOOK_XML[start_book])
-        verses = get_verses_in_range(
-            xml_path,
-            start_book,
-            (start_ch, start_vs),
-            (end_ch, end_vs),
-        )
-        for v in verses:
-            v["book"] = start_book
-        return verses
-    else:
-        # Cross-book page (e.g., Ps→Job or Job→Prov)
-        all_verses = []
-
-        # First book: from start_cv to end of book
-        xml_path = str(MAM_XML_DIR / BOOK_XML[start_book])
-        verses1 = get_verses_in_range(
-            xml_path,
-            start_book,
-            (start_ch, start_vs),
-            BOOK_END_SENTINEL,
-        )
-        for v in verses1:
-            v["book"] = start_book
-        all_verses.extend(verses1)
-
-        # Second book: from start of book to end_cv
-        xml_path = str(MAM_XML_DIR / BOOK_XML[end_book])
-        verses2 = get_verses_in_range(
-            xml_path,
-            end_book,
-            BOOK_START,
-            (end_ch, end_vs),
-        )
-        for v in verses2:
-            v["book"] = end_book
-        all_verses.extend(verses2)
-
-        return all_verses
-
-
-def _mark_group(cp):
-    """Group number for Hebrew combining marks (project standard order).
-
-    Only inter-group ordering is enforced. Within the accent group,
-    MAM-XML’s order is accepted as-is.
+        return [(start_book, (start_ch, start_vs), (end_ch, end_vs))]
+    # Cross-book page (e.g., Ps→Job or Job→Prov): first book from
+    # start_cv to end of book, second book from start of book to end_cv.
+    return [
+        (start_book, (start_ch, start_vs), BOOK_END_SENTINEL),
+        (end_book, BOOK_START, (end_ch, end_vs)),
+    ]
+
+
+def get_pages_verses(text_ranges):
+    """Fetch the verses of many pages, reading each MAM-XML book once.
 
     Args:
-        cp: integer code point of a combining character.
+        text_ranges: list of text ranges as accepted by get_page_verses.
+
+    Returns:
+        One verse list per page, in request order.
     """
-    if cp in (0x05C1, 0x05C2):  # shin/sin dot
-        return 0
-    if cp == 0x05BC:  # dagesh
-        return 1
-    if cp == 0x05BF:  # rafeh
-        return 2
-    if 0x05B0 <= cp <= 0x05BB or cp == 0x05C7:  # vowels
-        return 3
-    if cp == 0x05BD:  # meteg
-        return 4
-    return 5  # accents (cantillation marks)
-
-
-def _assert_standard_order(word, verse_label):
-    """Assert combining marks on each base letter follow standard group order.
-
-    Checks that no mark from a lower-numbered group appears after a mark
-    from a higher-numbered group. Does NOT enforce ordering within the
-    accent group (group 5).
+    page_ranges = [_page_ranges(tr) for tr in text_ranges]
+    flat = get_verses_for_ranges([r for prs in page_ranges for r in prs])
+    results = []
+    pos = 0
+    for prs in page_ranges:
+        verses = []
+        for part in flat[pos : pos + len(prs)]:
+            verses.extend(part)
+        pos += len(prs)
+        results.append(verses)
+    return results
+
+
+def get_page_verses(text_range):
+    """Fetch all verses for a page from MAM-XML, handling cross-book pages.
 
     Args:
-        word: a single Hebrew word string (base letters + combining marks).
-        verse_label: human-readable verse label (e.g. "Job 38:1") for
-            error messages.
+        text_range: [[book, ch, vs], [book, ch, vs]] pair from
+            index-flat.json, giving the start and end of the page’s
+            text coverage.
+
+    Returns:
+        List of verse dicts, each with keys: book, cv, words,
+        ketiv_indices, parashah_before.
     """
-    i = 0
-    while i < len(word):
-        ch = word[i]
-        if unicodedata.combining(ch) == 0:
-            marks = []
-            j = i + 1
-            while j < len(word) and unicodedata.combining(word[j]) != 0:
-                marks.append(word[j])
-                j += 1
-            # Check inter-group ordering
-            max_group_seen = -1
-            for m in marks:
-                g = _mark_group(ord(m))
-                if g < max_group_seen:
-                    marks_str = " ".join(f"U+{ord(x):04X}" for x in marks)
-                    raise AssertionError(
-                        f"Non-standard combining mark order in {verse_label}, "
-                        f"word '{word}': group {g} mark U+{ord(m):04X} "
-                        f"appears after group {max_group_seen}. "
-                        f"Marks: [{marks_str}]"
-                    )
-                max_group_seen = max(max_group_seen, g)
-            i = j
-        else:
-            i += 1
+    return get_pages_verses([text_range])[0]
 
 
 def build_flat_stream(page_id, verses):
@@ -194,6 +156,12 @@ def build_flat_stream(page_id, verses):
     Returns:
         The flat stream list (strings and marker dicts).
     """
+    # Check combining-mark order for the whole page in one pass,
+    # reporting every offending word.
+    assert_standard_order(
+        (f"{v['book']} {v['cv']}", word) for v in verses for word in v["words"]
+    )
+
     stream = []
     stream.append({"page-start": page_id})
 
@@ -207,7 +175,6 @@ def build_flat_stream(page_id, verses):
 
         stream.append({"verse-start": label})
         for word in v["words"]:
-            _assert_standard_order(word, label)
             # Split at maqaf (U+05BE) keeping the maqaf attached
             # to the preceding fragment: "אֽוֹ־מֹשְׁכ֖וֹת" → ["אֽוֹ־", "מֹשְׁכ֖וֹת"]
             parts = word.split("\u05be")
@@ -249,10 +216,12 @@ def main():
     for page_id in OUR_PAGES:
         if page_id not in index:
             print(f"WARNING: {page_id} not found in index-flat.json")
-            continue
+    page_ids = [p for p in OUR_PAGES if p in index]
+    all_verses = get_pages_verses([index[p] for p in page_ids])
+
+    for page_id, verses in zip(page_ids, all_verses):
         text_range = index[page_id]
         print(f"{page_id}: {text_range[0]} .. {text_range[1]}")
-        verses = get_page_verses(text_range)
         stream = build_flat_stream(page_id, verses)
 
         if page_id in pages_set:
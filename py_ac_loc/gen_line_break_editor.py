@@ -6,7 +6,9 @@ Reads a flat-stream JSON from py_ac_loc/line-breaks/<page>.json,
 produces a self-contained HTML file with:
   - Left panel: clickable ground-truth words (RTL) with existing
     line-break markers shown
-  - Right panel: Aleppo Codex page image (from archive.org)
+  - Right panel: Aleppo Codex page image (from the shared image store,
+    which downloads it from archive.org once; archive.org directly if
+    the store has since evicted it)
 
 Click the last word of each line to toggle line-end markers.
 "Export JSON" copies the updated flat-stream (with line-start/line-end
@@ -22,47 +24,30 @@ import json
 import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from py_ac_loc.image_store import image_url, local_image_url
+from py_ac_loc.line_break_page import load_page
+
 BASE = Path(__file__).resolve().parent.parent
 AC_DIR = BASE / "py_ac_loc"
 LB_DIR = AC_DIR / "line-breaks"
 OUT_DIR = BASE / ".novc"
 
 
-def _leaf_to_page_n(page_id):
-    """Convert a leaf ID like '270r' to the archive.org 0-based page index."""
-    num = int(page_id[:-1])
-    side = page_id[-1]
-    # For Job leaves (past the extra leaf 241a):
-    # N = (leaf_number - 1) * 2 + 2 + (0 for recto, 1 for verso)
-    return (num - 1) * 2 + 2 + (0 if side == "r" else 1)
-
-
-def _image_url(page_id):
-    """Build archive.org direct image URL for an Aleppo Codex page."""
-    n = _leaf_to_page_n(page_id)
-    return (
-        "https://ia601801.us.archive.org/BookReader/BookReaderImages.php"
-        f"?zip=/7/items/aleppo-codex/Aleppo%20Codex_jp2.zip"
-        f"&file=Aleppo%20Codex_jp2/Aleppo%20Codex_{n:04d}.jp2"
-        f"&id=aleppo-codex&scale=2&rotate=0"
-    )
-
-
-def load_stream(page_id):
-    """Load the flat-stream JSON for a page."""
+def load_line_break_page(page_id):
+    """Load the parsed line-break Page for a page."""
     path = LB_DIR / f"{page_id}.json"
     if not path.exists():
         print(f"ERROR: {path} not found")
         sys.exit(1)
-    return json.loads(path.read_text(encoding="utf-8"))
+    return load_page(path)
 
 
-def _extract_words_and_markers(stream):
-    """Extract word list and pre-existing line-end indices from a flat stream.
+def _extract_words_and_markers(page):
+    """Extract word list and pre-existing line-end indices from a page.
 
     Args:
-        stream: flat stream list (strings and marker dicts) as loaded
-            from a line-break JSON file.
+        page: line_break_page.Page for a line-break JSON file.
 
     Returns:
         words: list of dicts describing each word/parashah token.
@@ -71,58 +56,52 @@ def _extract_words_and_markers(stream):
         page_start_idx: word index of the first word on the page (from
             line-start col 1 line-num 1), or None if not yet set.
     """
-    words = []
-    line_ends = []
-    page_start_idx = None
+    # The editor labels words by the last verse-start seen (fragments
+    # and verse ends do not change it).
+    verse_starts = [(v.start, v.label) for v in page.verses if not v.fragment]
+    vi = 0
     current_verse = None
-    word_idx = 0
-
-    for item in stream:
-        if isinstance(item, str):
-            is_first = current_verse is not None and (
-                len(words) == 0
-                or words[-1].get("verse_label") != current_verse
-                or words[-1].get("is_parashah")
-            )
+
+    words = []
+    for i, tok in enumerate(page.tokens):
+        while vi < len(verse_starts) and verse_starts[vi][0] <= i:
+            current_verse = verse_starts[vi][1]
+            vi += 1
+        if tok.is_parashah:
             words.append(
                 {
-                    "text": item,
-                    "is_verse_start": is_first,
+                    "text": tok.text,
+                    "is_verse_start": False,
                     "verse_label": current_verse,
-                    "is_parashah": False,
+                    "is_parashah": True,
+                    "parashah_value": tok.text,
                 }
             )
-            word_idx += 1
-        elif isinstance(item, dict):
-            if "verse-start" in item:
-                current_verse = item["verse-start"]
-            elif "verse-end" in item:
-                pass
-            elif "parashah" in item:
-                words.append(
-                    {
-                        "text": item["parashah"],
-                        "is_verse_start": False,
-                        "verse_label": current_verse,
-                        "is_parashah": True,
-                        "parashah_value": item["parashah"],
-                    }
-                )
-                word_idx += 1
-            elif "line-start" in item:
-                ls = item["line-start"]
-                if ls["col"] == 1 and ls["line-num"] == 1:
-                    page_start_idx = word_idx
-            elif "line-end" in item:
-                if word_idx > 0:
-                    line_ends.append(
-                        (
-                            word_idx - 1,
-                            item["line-end"]["col"],
-                            item["line-end"]["line-num"],
-                        )
-                    )
-            # page-start, page-end: skip
+            continue
+        is_first = current_verse is not None and (
+            len(words) == 0
+            or words[-1].get("verse_label") != current_verse
+            or words[-1].get("is_parashah")
+        )
+        words.append(
+            {
+                "text": tok.text,
+                "is_verse_start": is_first,
+                "verse_label": current_verse,
+                "is_parashah": False,
+            }
+        )
+
+    line_ends = []
+    page_start_idx = None
+    for pos, item in page.markers:
+        if "line-start" in item:
+            ls = item["line-start"]
+            if ls["col"] == 1 and ls["line-num"] == 1:
+                page_start_idx = pos
+        elif pos > 0:
+            le = item["line-end"]
+            line_ends.append((pos - 1, le["col"], le["line-num"]))
 
     return words, line_ends, page_start_idx
 
@@ -134,9 +113,10 @@ def generate_editor_html(page_id, col):
         page_id: leaf identifier, e.g. "270r".
         col: column number (1 = right column, 2 = left column).
     """
-    stream = load_stream(page_id)
-    words, line_ends, page_start_idx = _extract_words_and_markers(stream)
-    image_url = _image_url(page_id)
+    page = load_line_break_page(page_id)
+    words, line_ends, page_start_idx = _extract_words_and_markers(page)
+    img_src = local_image_url(page_id, OUT_DIR)
+    img_fallback = image_url(page_id, scale=2)
 
     # CSS crop: col 1 shows right 60%, col 2 shows left 60%
     # We set the image wider than its container and offset it.
@@ -170,7 +150,7 @@ def generate_editor_html(page_id, col):
     # Build the stream without line markers for export reconstruction
     stream_no_lines = [
         item
-        for item in stream
+        for item in page.stream
         if not (isinstance(item, dict) and ("line-start" in item or "line-end" in item))
     ]
 
@@ -188,7 +168,8 @@ def generate_editor_html(page_id, col):
 
     html = _HTML_TEMPLATE.format(
         page_id=page_id,
-        image_url=image_url,
+        img_src=img_src,
+        img_fallback=img_fallback,
         img_css=initial_img_css,
         col1_wide=col1_wide,
         col1_skinny=col1_skinny,
@@ -333,7 +314,8 @@ h1 button:hover {{ background: #1177bb; }}
     <div class="col-words" id="wordsPanel"></div>
     <div class="divider" id="divider"></div>
     <div class="col-image" id="imagePanel">
-        <img src="{image_url}" alt="Aleppo Codex {page_id}">
+        <img src="{img_src}" alt="Aleppo Codex {page_id}"
+             onerror="this.onerror=null; this.src='{img_fallback}'">
     </div>
 </div>
 
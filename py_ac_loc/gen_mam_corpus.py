@@ -0,0 +1,152 @@
+"""
+Build a single whole-Tanakh corpus file from every MAM-XML file.
+
+Each file in py_ac_loc/MAM-XML/ is extracted by its own worker process
+(with get_verse_words semantics, via iter_file_verses), so a full build
+takes about as long as the largest file rather than the sum of all 24.
+The results are merged into one JSON file:
+
+    {
+      "version": 1,
+      "sources": {"Gen.xml": "<sha256>", ...},
+      "books": [
+        {"book": "Gen", "file": "Gen.xml", "verses": [<verse dict>, ...]},
+        ...
+      ]
+    }
+
+Verse dicts are as returned by mam_xml_verses.get_verses_in_range
+(cv, words, ketiv_indices, parashah_before). Books appear in BOOK_ORDER.
+
+load_corpus() returns the corpus, rebuilding it only when a source file
+has changed since the last build.
+
+Usage:
+    python py_ac_loc/gen_mam_corpus.py           # build if stale
+    python py_ac_loc/gen_mam_corpus.py --force   # always rebuild
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from py_ac_loc.mam_xml_verses import iter_file_verses
+
+BASE = Path(__file__).resolve().parent.parent
+MAM_XML_DIR = BASE / "py_ac_loc" / "MAM-XML"
+CORPUS_PATH = BASE / ".novc" / "mam-corpus.json"
+
+CORPUS_VERSION = 1
+
+# OSIS book IDs in the order they are written to the corpus (the
+# conventional printed order). Books found in the XML but missing
+# here are appended at the end.
+BOOK_ORDER = [
+    "Gen", "Exod", "Lev", "Num", "Deut",
+    "Josh", "Judg", "1Sam", "2Sam", "1Kgs", "2Kgs",
+    "Isa", "Jer", "Ezek",
+    "Hos", "Joel", "Amos", "Obad", "Jonah", "Mic",
+    "Nah", "Hab", "Zeph", "Hag", "Zech", "Mal",
+    "Ps", "Prov", "Job", "Song", "Ruth", "Lam", "Eccl", "Esth",
+    "Dan", "Ezra", "Neh", "1Chr", "2Chr",
+]  # fmt: skip
+
+
+def _source_hashes():
+    """Return {file name: sha256} for every MAM-XML file."""
+    return {
+        p.name: hashlib.sha256(p.read_bytes()).hexdigest()
+        for p in sorted(MAM_XML_DIR.glob("*.xml"))
+    }
+
+
+def _extract_file(xml_path):
+    """Worker: extract all books of one MAM-XML file.
+
+    Args:
+        xml_path: path to the MAM-XML file.
+
+    Returns:
+        list of (book, verses) pairs in file order.
+    """
+    books = {}
+    for book, verse in iter_file_verses(xml_path):
+        books.setdefault(book, []).append(verse)
+    return list(books.items())
+
+
+def build_corpus(max_workers=None):
+    """Extract every MAM-XML file in parallel and return the corpus dict.
+
+    Args:
+        max_workers: process count; defaults to one per XML file.
+    """
+    sources = _source_hashes()
+    paths = [MAM_XML_DIR / name for name in sources]
+    # Largest files first, so the longest job starts immediately.
+    paths.sort(key=lambda p: p.stat().st_size, reverse=True)
+
+    entries = []
+    with ProcessPoolExecutor(max_workers=max_workers or len(paths)) as pool:
+        for path, books in zip(paths, pool.map(_extract_file, paths)):
+            for book, verses in books:
+                entries.append({"book": book, "file": path.name, "verses": verses})
+
+    order = {book: i for i, book in enumerate(BOOK_ORDER)}
+    entries.sort(key=lambda e: order.get(e["book"], len(order)))
+    return {"version": CORPUS_VERSION, "sources": sources, "books": entries}
+
+
+def write_corpus(corpus):
+    """Write the corpus JSON atomically to CORPUS_PATH."""
+    CORPUS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = CORPUS_PATH.with_name(f"{CORPUS_PATH.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(corpus, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, CORPUS_PATH)
+    return CORPUS_PATH
+
+
+def _read_corpus():
+    try:
+        return json.loads(CORPUS_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def load_corpus(force=False):
+    """Return the corpus, rebuilding it if missing or out of date.
+
+    Args:
+        force: if True, rebuild even when the file on disk is current.
+    """
+    corpus = None if force else _read_corpus()
+    if (
+        corpus is None
+        or corpus.get("version") != CORPUS_VERSION
+        or corpus.get("sources") != _source_hashes()
+    ):
+        corpus = build_corpus()
+        write_corpus(corpus)
+    return corpus
+
+
+def main():
+    force = "--force" in sys.argv[1:]
+    t0 = time.perf_counter()
+    corpus = load_corpus(force=force)
+    elapsed = time.perf_counter() - t0
+    n_verses = sum(len(b["verses"]) for b in corpus["books"])
+    n_words = sum(len(v["words"]) for b in corpus["books"] for v in b["verses"])
+    print(
+        f"{CORPUS_PATH}: {len(corpus['books'])} books, {n_verses} verses, "
+        f"{n_words} words ({elapsed:.2f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Hebrew word normalization at named match levels, via precomputed tables.
+
+Levels, from strictest to loosest:
+
+  exact        the string itself
+  nfc          Unicode NFC
+  pointed      consonants + points (vowels, dagesh, shin/sin dots), NFC;
+               accents, meteg, rafeh and format characters dropped
+  consonantal  all combining marks and format characters dropped
+               (the historical hebrew_metrics.strip_heb)
+  letters      consonantal, also ignoring maqaf, paseq and sof pasuq
+
+Each non-NFC level is one str.translate call with a code point -> None
+table (filled on demand via __missing__, like mark_order's group table),
+and normalize() is memoized per distinct (word, level), so repeated
+comparisons of the same token cost a dict lookup.
+
+Usage:
+    from py_ac_loc.hebrew_norm import normalize, match_level
+
+    normalize("וַיַּֽעַן־", "letters")     # -> "ויען"
+    match_level("כִּֽי־", "כִּי־")           # -> "pointed"
+"""
+
+import unicodedata
+from functools import lru_cache
+
+LEVELS = ("exact", "nfc", "pointed", "consonantal", "letters")
+
+MAQAF = "־"
+PASEQ = "׀"
+SOF_PASUQ = "׃"
+
+# Combining marks kept at the "pointed" level.
+_POINTS = {cp for cp in range(0x05B0, 0x05BD)} | {0x05C1, 0x05C2, 0x05C7}
+
+
+class _DropTable(dict):
+    """str.translate table: code point -> None (drop) or itself, on demand."""
+
+    def __init__(self, drop):
+        super().__init__()
+        self._drop = drop
+
+    def __missing__(self, cp):
+        value = None if self._drop(cp) else cp
+        self[cp] = value
+        return value
+
+
+def _is_mark_or_format(cp):
+    return unicodedata.category(chr(cp)) in ("Mn", "Cf")
+
+
+_TABLES = {
+    "pointed": _DropTable(lambda cp: _is_mark_or_format(cp) and cp not in _POINTS),
+    "consonantal": _DropTable(_is_mark_or_format),
+    "letters": _DropTable(
+        lambda cp: _is_mark_or_format(cp) or chr(cp) in (MAQAF, PASEQ, SOF_PASUQ)
+    ),
+}
+for _table in _TABLES.values():
+    for _cp in range(0x0590, 0x0600):  # precompute the Hebrew block
+        _table[_cp]
+del _table, _cp
+
+
+@lru_cache(maxsize=1 << 17)
+def normalize(s, level="consonantal"):
+    """Return *s* normalized at match *level* (one of LEVELS).
+
+    Memoized, so each distinct token is normalized once per level.
+    """
+    if level == "exact":
+        return s
+    if level == "nfc":
+        return unicodedata.normalize("NFC", s)
+    if level == "pointed":
+        return unicodedata.normalize("NFC", s.translate(_TABLES["pointed"]))
+    try:
+        return s.translate(_TABLES[level])
+    except KeyError:
+        raise ValueError(f"Unknown match level {level!r}") from None
+
+
+def same_word(a, b, level="consonantal"):
+    """Return True if *a* and *b* are equal at match *level*."""
+    return a == b or normalize(a, level) == normalize(b, level)
+
+
+def match_level(a, b):
+    """Return the strictest level at which *a* and *b* match, or None."""
+    for level in LEVELS:
+        if normalize(a, level) == normalize(b, level):
+            return level
+    return None
@@ -0,0 +1,401 @@
+"""
+Content-addressed store for Aleppo Codex page images.
+
+One on-disk cache, shared by every tool that needs a page image
+(codex_page.download_page, kraken_seg_baselines, and the two HTML
+editors), instead of each keeping its own copies. Layout under
+.novc/image-store/:
+
+  objects/<ab>/<sha256>.jpg   the server's bytes, exactly as downloaded
+                              (or a derived level, see below), named by
+                              their SHA-256 (identical images are stored
+                              once)
+  keys/<leaf>_s<scale>        the SHA-256 of the image for that key, and
+                              for a derived level the scale it came from
+
+Every file is written to a temporary name and renamed into place, so a
+reader never sees a partial file and needs no lock. Reads check the
+checksum; a corrupt object is dropped and fetched again. An object's
+mtime is its last use: when the store grows past its budget, the least
+recently used objects are evicted (under a lock file, by one process at
+a time), except those used within the last EVICT_GRACE seconds, which a
+concurrent reader may be about to open.
+
+    store = ImageStore()
+    data = store.fetch_bytes("270r", scale=2)   # downloads on a miss
+    path = store.fetch("270r", scale=2)         # path of the cached copy
+
+Each leaf's cached scales form a local resolution pyramid: on a miss
+for a scale coarser than one already cached (archive.org scale k is
+1/k of full size), the image is derived from the nearest finer cached
+level (JPEG draft-mode decode, Lanczos resize, re-encode) instead of
+being downloaded again. This needs Pillow; without it, coarser scales
+are downloaded as before.
+
+The budget defaults to DEFAULT_BUDGET_MB megabytes, overridable by the
+ALEPPO_IMAGE_STORE_MB environment variable or the budget argument.
+
+Misses are downloaded from archive.org, or, if a local copy of
+"Aleppo Codex_jp2.zip" is set (use_jp2_zip(), or the ALEPPO_JP2_ZIP
+environment variable), read from it offline (see jp2_zip_source).
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import urllib.request
+from io import BytesIO
+from pathlib import Path
+
+STORE_DIR = Path(__file__).resolve().parent.parent / ".novc" / "image-store"
+DEFAULT_BUDGET_MB = 1024
+EVICT_GRACE = 60.0  # seconds; recently used objects are never evicted
+LOCK_STALE = 120.0  # seconds; a lock file older than this is abandoned
+DERIVED_QUALITY = 92  # JPEG quality of derived pyramid levels
+
+IMAGE_BASE_URL = (
+    "https://ia601801.us.archive.org/BookReader/BookReaderImages.php"
+    "?zip=/7/items/aleppo-codex/Aleppo%20Codex_jp2.zip"
+    "&file=Aleppo%20Codex_jp2/Aleppo%20Codex_{n:04d}.jp2"
+    "&id=aleppo-codex&scale={scale}&rotate=0"
+)
+
+
+def leaf_to_page_n(page_id):
+    """Convert a leaf ID like '270r' to the archive.org 0-based page index."""
+    num = int(page_id[:-1])
+    side = page_id[-1]
+    # For Job leaves (past the extra leaf 241a):
+    # N = (leaf_number - 1) * 2 + 2 + (0 for recto, 1 for verso)
+    return (num - 1) * 2 + 2 + (0 if side == "r" else 1)
+
+
+def image_url(page_id, scale=2):
+    """Build archive.org direct image URL for an Aleppo Codex page."""
+    return IMAGE_BASE_URL.format(n=leaf_to_page_n(page_id), scale=scale)
+
+
+def download_url(url, timeout=60):
+    """Return the bytes at *url*."""
+    req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return resp.read()
+
+
+_jp2_zip = os.environ.get("ALEPPO_JP2_ZIP") or None
+_jp2_source = None
+
+
+def use_jp2_zip(zip_path):
+    """Read page images from a local JP2 zip (None: download them again)."""
+    global _jp2_zip, _jp2_source
+    _jp2_zip = str(zip_path) if zip_path else None
+    _jp2_source = None
+
+
+def fetch_from_source(page_id, scale=2):
+    """Return page image bytes from the configured source (zip or web)."""
+    global _jp2_source
+    if _jp2_zip is None:
+        print(f"  Downloading {page_id} (scale={scale})...")
+        return download_url(image_url(page_id, scale))
+    if _jp2_source is None:
+        from py_ac_loc.jp2_zip_source import Jp2ZipSource
+
+        _jp2_source = Jp2ZipSource(_jp2_zip)
+    print(f"  Reading {page_id} (scale={scale}) from {_jp2_zip}")
+    return _jp2_source.render(page_id, scale)
+
+
+def _write_atomic(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # A unique temp file per call: several threads may write the same path.
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class ImageStore:
+    """Page images keyed by (leaf, scale), stored by content hash."""
+
+    def __init__(self, root=STORE_DIR, budget=None):
+        """
+        Args:
+            root: store directory.
+            budget: maximum total size of the objects, in bytes; defaults
+                to ALEPPO_IMAGE_STORE_MB or DEFAULT_BUDGET_MB megabytes.
+        """
+        self.root = Path(root)
+        if budget is None:
+            mb = float(os.environ.get("ALEPPO_IMAGE_STORE_MB", DEFAULT_BUDGET_MB))
+            budget = int(mb * 1024 * 1024)
+        self.budget = budget
+        # Running estimate of the objects' total size: measured by the
+        # first scan, then grown by this process's own writes. Only when
+        # it passes the budget does put() scan (and evict) again.
+        self._size = None
+        self._size_lock = threading.Lock()
+
+    def _key_path(self, page_id, scale):
+        return self.root / "keys" / f"{page_id}_s{scale}"
+
+    def _object_path(self, sha):
+        return self.root / "objects" / sha[:2] / f"{sha}.jpg"
+
+    def _lookup(self, page_id, scale):
+        """Return (sha, object path) for a key, or None."""
+        try:
+            key = self._key_path(page_id, scale).read_text(encoding="ascii")
+        except OSError:
+            return None
+        sha = key.split()[0]
+        return sha, self._object_path(sha)
+
+    def cached_scales(self, page_id):
+        """Return the scales stored for *page_id*, finest first."""
+        scales = []
+        for key_path in (self.root / "keys").glob(f"{page_id}_s*"):
+            try:
+                scales.append(int(key_path.name.rsplit("_s", 1)[1]))
+            except ValueError:
+                continue
+        return sorted(scales)
+
+    def _get(self, page_id, scale):
+        """Return (data, object path) for (page_id, scale), checked, or None."""
+        hit = self._lookup(page_id, scale)
+        if hit is None:
+            return None
+        sha, path = hit
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None  # evicted
+        if hashlib.sha256(data).hexdigest() != sha:
+            print(f"  Dropping corrupt cached image {path.name}")
+            path.unlink(missing_ok=True)
+            return None
+        self._touch(path)
+        return data, path
+
+    def get_bytes(self, page_id, scale=2):
+        """Return the stored bytes for (page_id, scale), or None on a miss."""
+        hit = self._get(page_id, scale)
+        return None if hit is None else hit[0]
+
+    def cached_path(self, page_id, scale=2):
+        """Return the object path for (page_id, scale) if stored, else None.
+
+        Unlike get(), the object is not read or checked, only marked used.
+        """
+        hit = self._lookup(page_id, scale)
+        if hit is None or not hit[1].exists():
+            return None
+        self._touch(hit[1])
+        return hit[1]
+
+    def get(self, page_id, scale=2):
+        """Return the path of the stored image for (page_id, scale), or None."""
+        hit = self._get(page_id, scale)
+        return None if hit is None else hit[1]
+
+    def put(self, page_id, scale, data, derived_from=None, evict=True):
+        """Store *data* as the image for (page_id, scale); return its path.
+
+        Args:
+            derived_from: the finer scale *data* was derived from, if any.
+            evict: if False, skip the budget check (the caller evicts).
+        """
+        sha = hashlib.sha256(data).hexdigest()
+        path = self._object_path(sha)
+        if path.exists():
+            self._touch(path)
+            added = 0
+        else:
+            _write_atomic(path, data)
+            added = len(data)
+        key = sha if derived_from is None else f"{sha} derived-from-s{derived_from}"
+        _write_atomic(self._key_path(page_id, scale), key.encode("ascii"))
+        with self._size_lock:
+            if self._size is not None:
+                self._size += added
+            over = self._size is None or self._size > self.budget
+        if over and evict:
+            self.evict()
+        return path
+
+    def _derive(self, page_id, scale):
+        """Build (page_id, scale) from the nearest finer cached level.
+
+        Returns:
+            (data, object path) of the stored level, or None if no finer
+            level is cached (or Pillow is not available).
+        """
+        finer = [s for s in self.cached_scales(page_id) if s < scale]
+        if not finer:
+            return None
+        try:
+            from PIL import Image
+        except ImportError:
+            return None
+        for src_scale in reversed(finer):  # nearest first
+            src_data = self.get_bytes(page_id, src_scale)
+            if src_data is not None:
+                break
+        else:
+            return None
+        img = Image.open(BytesIO(src_data))
+        w, h = img.size
+        # Ceiling division, as JPEG 2000 resolution reduction (and so the
+        # server's renderings) sizes each level; round() could come out
+        # 1px short of a downloaded level and of column-coordinates'
+        # image_size.
+        size = (
+            max(1, -(-w * src_scale // scale)),
+            max(1, -(-h * src_scale // scale)),
+        )
+        # Let libjpeg do most of the reduction (DCT scaling), then resize.
+        img.draft(img.mode, size)
+        img = img.resize(size, Image.LANCZOS)
+        out = BytesIO()
+        img.save(out, "JPEG", quality=DERIVED_QUALITY)
+        data = out.getvalue()
+        print(f"  Derived {page_id} (scale={scale}) from scale {src_scale}")
+        # Just read the source level; skip put()'s budget check here.
+        path = self.put(page_id, scale, data, derived_from=src_scale, evict=False)
+        return data, path
+
+    def _fetch(self, page_id, scale, download):
+        """Return (data, object path) for (page_id, scale); see fetch_bytes.
+
+        The path is the object just read or written, not looked up again:
+        another process may replace or drop the key in the meantime.
+        """
+        hit = self._get(page_id, scale)
+        if hit is None:
+            hit = self._derive(page_id, scale)
+        if hit is None:
+            data = (download or fetch_from_source)(page_id, scale)
+            hit = data, self.put(page_id, scale, data)
+        return hit
+
+    def fetch_bytes(self, page_id, scale=2, download=None):
+        """Return the image bytes for (page_id, scale).
+
+        On a miss, the image is derived from a finer cached level of the
+        same leaf if there is one, and downloaded otherwise.
+
+        Args:
+            page_id: leaf identifier, e.g. "270r".
+            scale: archive.org scale (1 = full size, 2 = half, ...).
+            download: callable (page_id, scale) -> bytes used on a miss;
+                defaults to fetch_from_source.
+        """
+        return self._fetch(page_id, scale, download)[0]
+
+    def fetch(self, page_id, scale=2, download=None):
+        """Like fetch_bytes, but return the path of the cached copy."""
+        return self._fetch(page_id, scale, download)[1]
+
+    @staticmethod
+    def _touch(path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _lock(self):
+        """Take the store's lock file; return False if another process holds it."""
+        lock_path = self.root / "lock"
+        self.root.mkdir(parents=True, exist_ok=True)
+        try:
+            if time.time() - lock_path.stat().st_mtime > LOCK_STALE:
+                lock_path.unlink(missing_ok=True)
+        except OSError:
+            pass
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return False
+        return True
+
+    def evict(self):
+        """Delete least recently used objects until the store fits its budget.
+
+        Returns:
+            Number of objects deleted (0 if another process is evicting).
+        """
+        objects = []
+        for path in (self.root / "objects").glob("*/*.jpg"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            objects.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in objects)
+        with self._size_lock:
+            self._size = total
+        if total <= self.budget or not self._lock():
+            return 0
+        n_deleted = 0
+        try:
+            cutoff = time.time() - EVICT_GRACE
+            for mtime, size, path in sorted(objects):
+                if total <= self.budget or mtime > cutoff:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                n_deleted += 1
+            if n_deleted:
+                # Drop keys whose object is gone.
+                for key_path in (self.root / "keys").glob("*"):
+                    if "." in key_path.name:
+                        continue  # another writer's temp file (see _write_atomic)
+                    try:
+                        sha = key_path.read_text(encoding="ascii").split()[0]
+                    except (OSError, IndexError):
+                        continue
+                    if not self._object_path(sha).exists():
+                        key_path.unlink(missing_ok=True)
+        finally:
+            (self.root / "lock").unlink(missing_ok=True)
+        with self._size_lock:
+            self._size = total
+        return n_deleted
+
+
+_default_store = None
+
+
+def default_store():
+    """Return the process-wide ImageStore at STORE_DIR."""
+    global _default_store
+    if _default_store is None:
+        _default_store = ImageStore()
+    return _default_store
+
+
+def local_image_url(page_id, rel_to, scale=2):
+    """Image URL for an HTML file in *rel_to*: the store's copy, relative.
+
+    The image is fetched into the default store only if it is not there
+    yet. If it cannot be fetched, the archive.org URL is returned. The
+    store may later evict the copy, so pages using this should fall back
+    to image_url() when it fails to load (see the editors' onerror).
+    """
+    store = default_store()
+    path = store.cached_path(page_id, scale)
+    if path is None:
+        try:
+            path = store.fetch(page_id, scale)
+        except (OSError, ImportError) as e:
+            print(f"  Could not fetch image ({e}); linking archive.org")
+            return image_url(page_id, scale)
+    return Path(os.path.relpath(path, rel_to)).as_posix()
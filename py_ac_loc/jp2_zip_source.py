@@ -0,0 +1,105 @@
+"""
+Page images read from a local copy of "Aleppo Codex_jp2.zip".
+
+The archive.org image URLs (image_store.image_url) are renderings of the
+JPEG 2000 members of that zip. With a local copy of the zip, pages can
+be read offline: only the one member is read (the archive is never
+extracted), and JPEG 2000's resolution levels are used so that a page
+wanted at archive.org scale 2, 4 or 8 is decoded at that reduced
+resolution directly instead of at full size and then shrunk.
+
+    source = Jp2ZipSource("/data/Aleppo Codex_jp2.zip")
+    img = source.open_image("270r", scale=2)      # lazily decoded, reduced
+    crop = source.read_region("270r", 2, (0, 0, 800, 600))
+    data = source.render("270r", scale=2)          # JPEG bytes
+
+Pillow decodes a reduced JP2 level whole, so read_region() decodes the
+reduced page and crops it (tile-level region decoding would need
+OpenJPEG bindings beyond Pillow's).
+
+image_store uses this source, instead of downloading, when a zip is set
+with image_store.use_jp2_zip() or the ALEPPO_JP2_ZIP environment
+variable.
+"""
+
+import threading
+import zipfile
+from io import BytesIO
+
+from PIL import Image
+
+from py_ac_loc.image_store import leaf_to_page_n
+
+MEMBER_NAME = "Aleppo Codex_jp2/Aleppo Codex_{n:04d}.jp2"
+RENDER_QUALITY = 95  # JPEG quality of rendered pages
+
+
+class Jp2ZipSource:
+    """Read Aleppo Codex pages from the JP2 members of a local zip."""
+
+    def __init__(self, zip_path):
+        self.zip_path = zip_path
+        self._zip = None
+        self._members = None  # page index -> member name
+        self._lock = threading.Lock()
+
+    def _open_zip(self):
+        with self._lock:
+            if self._zip is None:
+                self._zip = zipfile.ZipFile(self.zip_path)
+                self._members = {}
+                for name in self._zip.namelist():
+                    stem = name.rsplit("/", 1)[-1]
+                    if stem.endswith(".jp2") and "_" in stem:
+                        try:
+                            n = int(stem[:-4].rsplit("_", 1)[1])
+                        except ValueError:
+                            continue
+                        self._members[n] = name
+        return self._zip
+
+    def member_name(self, page_id):
+        """Return the zip member name of *page_id*'s JP2 image."""
+        self._open_zip()
+        n = leaf_to_page_n(page_id)
+        try:
+            return self._members[n]
+        except KeyError:
+            raise FileNotFoundError(
+                f"{MEMBER_NAME.format(n=n)} not in {self.zip_path}"
+            ) from None
+
+    def open_image(self, page_id, scale=1):
+        """Open *page_id* at archive.org *scale* (1 = full size), undecoded.
+
+        The power-of-two part of *scale* is taken from the JP2 resolution
+        levels; any remainder (e.g. scale 3) is left to the caller, who
+        should check img.size.
+        """
+        zf = self._open_zip()
+        data = zf.read(self.member_name(page_id))  # only this member
+        img = Image.open(BytesIO(data))
+        levels = 0
+        while 2 ** (levels + 1) <= scale:
+            levels += 1
+        if levels:
+            img.reduce = levels  # Pillow's JPEG 2000 resolution reduction
+        return img
+
+    def read_region(self, page_id, scale, box):
+        """Return the (left, upper, right, lower) *box* of the page at *scale*."""
+        return self.open_image(page_id, scale).crop(box)
+
+    def render(self, page_id, scale=2):
+        """Return *page_id* at *scale* as JPEG bytes (for the image store)."""
+        img = self.open_image(page_id, scale)
+        full_w, full_h = img.size  # full resolution until loaded
+        size = (max(1, round(full_w / scale)), max(1, round(full_h / scale)))
+        img.load()
+        if max(abs(a - b) for a, b in zip(img.size, size)) > 1:
+            img = img.resize(size, Image.LANCZOS)  # scale not a power of two
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        out = BytesIO()
+        img.save(out, "JPEG", quality=RENDER_QUALITY)
+        return out.getvalue()
@@ -27,16 +27,23 @@ Usage (runs in WSL via the kraken venv):
 
     With no args, processes all 24 Job pages (270r-281v).
     With args, processes only the named pages (e.g. 270r 275v).
+    With --jp2-zip PATH, page images are read from a local copy of
+    "Aleppo Codex_jp2.zip" instead of archive.org (fully offline).
+
+    Page images come from the shared image store; to download them all
+    up front (concurrently), first run py_ac_loc/prefetch_images.py.
 """
 
 import json
 import sys
-import urllib.request
 from pathlib import Path
 
 from PIL import Image, ImageDraw
 from kraken import blla
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from py_ac_loc.image_store import default_store, use_jp2_zip
+
 WORKSPACE = Path(__file__).resolve().parent.parent
 OUT_DIR = WORKSPACE / ".novc"
 COORD_DIR = Path(__file__).resolve().parent / "column-coordinates"
@@ -49,32 +56,9 @@ PAD = 5  # pixels of padding around column crop
 # ── image helpers ──────────────────────────────────────────────
 
 
-def _leaf_to_page_n(page_id):
-    num = int(page_id[:-1])
-    side = page_id[-1]
-    return (num - 1) * 2 + 2 + (0 if side == "r" else 1)
-
-
-def _image_url(page_id):
-    n = _leaf_to_page_n(page_id)
-    return (
-        "https://ia601801.us.archive.org/BookReader/BookReaderImages.php"
-        f"?zip=/7/items/aleppo-codex/Aleppo%20Codex_jp2.zip"
-        f"&file=Aleppo%20Codex_jp2/Aleppo%20Codex_{n:04d}.jp2"
-        f"&id=aleppo-codex&scale=2&rotate=0"
-    )
-
-
 def download_image(page_id):
-    cache = OUT_DIR / f"aleppo-page-{page_id}.jpg"
-    if cache.exists():
-        return Image.open(cache)
-    url = _image_url(page_id)
-    print(f"  Downloading image...")
-    req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
-    data = urllib.request.urlopen(req, timeout=60).read()
-    cache.write_bytes(data)
-    return Image.open(cache)
+    """Return the scale-2 page image, via the shared image store."""
+    return Image.open(default_store().fetch(page_id, scale=2))
 
 
 # ── column geometry ────────────────────────────────────────────
@@ -351,7 +335,18 @@ def segment_page(page_id):
 # ── entry point ────────────────────────────────────────────────
 
 if __name__ == "__main__":
-    pages = sys.argv[1:] if len(sys.argv) > 1 else ALL_PAGES
+    args = sys.argv[1:]
+    if "--jp2-zip" in args:
+        i = args.index("--jp2-zip")
+        if i + 1 >= len(args):
+            print(
+                "Usage: python py_ac_loc/kraken_seg_baselines.py "
+                "[--jp2-zip PATH] [page_id ...]"
+            )
+            sys.exit(1)
+        use_jp2_zip(args[i + 1])
+        del args[i : i + 2]
+    pages = args or ALL_PAGES
 
     results = {}
     for page_id in pages:
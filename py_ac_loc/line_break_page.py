@@ -0,0 +1,199 @@
+"""
+Parsed model of one line-breaks flat-stream page.
+
+A line-breaks JSON file is a flat list of Hebrew word strings and marker
+dicts (page-start, verse-start, line-start, parashah, ...). Page walks
+that list once and keeps:
+
+  tokens       every word string and parashah marker, in order (the
+               "word" numbering used by the editor and merge tools)
+  lines        one Line per line-start, with its [start, end) token range
+  columns      col -> list of Lines, in stream order
+  verses       one VerseSpan per verse-start / verse-fragment-start
+  parashot     (token index, value) for each parashah marker
+  markers      (token position, marker dict) for each line-start/line-end
+  token_line   array: token index -> index into lines (-1 if on no line)
+  line_start, line_end
+               arrays: line index -> [start, end) token range
+
+Tokens, lines and spans are __slots__ objects, so a page costs a few
+small objects per word rather than a dict each.
+
+load_page() caches Pages per process in an LRU keyed by the file's path,
+mtime and size, so every tool in one run shares one parse per page and an
+edited file is re-read automatically:
+
+    page = load_page("270r")
+    page.line_words(1, 3)               # word strings on col 1, line 3
+    page.line_of_token(42)              # -> Line (col, num, start, end)
+"""
+
+import json
+from array import array
+from functools import lru_cache
+from pathlib import Path
+
+LB_DIR = Path(__file__).resolve().parent / "line-breaks"
+
+
+class Token:
+    """A word string or parashah marker on a page."""
+
+    __slots__ = ("text", "is_parashah", "verse", "line", "item_idx")
+
+    def __init__(self, text, is_parashah, verse, line, item_idx):
+        self.text = text  # word, or parashah value (e.g. "spi-pe2")
+        self.is_parashah = is_parashah
+        self.verse = verse  # label of the enclosing verse span, or None
+        self.line = line  # index into Page.lines, or -1
+        self.item_idx = item_idx  # position in Page.stream
+
+
+class Line:
+    """A manuscript line: tokens [start, end) between line-start and line-end."""
+
+    __slots__ = ("col", "num", "start", "end", "closed")
+
+    def __init__(self, col, num, start):
+        self.col = col
+        self.num = num
+        self.start = start
+        self.end = start
+        self.closed = False  # True once its line-end marker was seen
+
+
+class VerseSpan:
+    """Tokens [start, end) of a verse (or verse fragment) on a page."""
+
+    __slots__ = ("label", "fragment", "start", "end", "closed")
+
+    def __init__(self, label, fragment, start):
+        self.label = label
+        self.fragment = fragment
+        self.start = start
+        self.end = start
+        self.closed = False  # True once its end marker was seen
+
+
+class Page:
+    """One line-breaks page, parsed in a single pass over its stream."""
+
+    def __init__(self, stream, name=None):
+        """
+        Args:
+            stream: flat stream list as loaded from a line-breaks JSON
+                file. It is kept (not copied) as self.stream.
+            name: page/leaf ID, e.g. "270r", if known.
+        """
+        self.name = name
+        self.stream = stream
+        self.tokens = []
+        self.lines = []
+        self.columns = {}
+        self.verses = []
+        self.parashot = []
+        self.markers = []
+        self._line_at = {}  # (col, num) -> first Line with that position
+
+        tokens = self.tokens
+        cur_line = None
+        cur_verse = None
+        for i, item in enumerate(stream):
+            if isinstance(item, str):
+                line_i = cur_line if cur_line is not None else -1
+                verse = cur_verse.label if cur_verse is not None else None
+                tokens.append(Token(item, False, verse, line_i, i))
+                continue
+            if not isinstance(item, dict):
+                continue
+            pos = len(tokens)
+            if "parashah" in item:
+                self.parashot.append((pos, item["parashah"]))
+                line_i = cur_line if cur_line is not None else -1
+                verse = cur_verse.label if cur_verse is not None else None
+                tokens.append(Token(item["parashah"], True, verse, line_i, i))
+            elif "line-start" in item:
+                self.markers.append((pos, item))
+                if cur_line is not None:
+                    self.lines[cur_line].end = pos
+                ls = item["line-start"]
+                line = Line(ls["col"], ls["line-num"], pos)
+                cur_line = len(self.lines)
+                self.lines.append(line)
+                self.columns.setdefault(line.col, []).append(line)
+                self._line_at.setdefault((line.col, line.num), line)
+            elif "line-end" in item:
+                self.markers.append((pos, item))
+                if cur_line is not None:
+                    self.lines[cur_line].end = pos
+                    self.lines[cur_line].closed = True
+                    cur_line = None
+            elif "verse-start" in item or "verse-fragment-start" in item:
+                if cur_verse is not None:
+                    cur_verse.end = pos
+                fragment = "verse-start" not in item
+                label = item["verse-fragment-start" if fragment else "verse-start"]
+                cur_verse = VerseSpan(label, fragment, pos)
+                self.verses.append(cur_verse)
+            elif "verse-end" in item or "verse-fragment-end" in item:
+                if cur_verse is not None:
+                    cur_verse.end = pos
+                    cur_verse.closed = True
+                    cur_verse = None
+        if cur_line is not None:
+            self.lines[cur_line].end = len(tokens)
+        if cur_verse is not None:
+            cur_verse.end = len(tokens)
+
+        self.token_line = array("i", (t.line for t in tokens))
+        self.line_start = array("I", (ln.start for ln in self.lines))
+        self.line_end = array("I", (ln.end for ln in self.lines))
+
+    @property
+    def words(self):
+        """The word strings on the page (parashah markers excluded)."""
+        return [t.text for t in self.tokens if not t.is_parashah]
+
+    def line(self, col, num):
+        """Return the Line at (col, num), or None."""
+        return self._line_at.get((col, num))
+
+    def line_tokens(self, col, num):
+        """Return the Tokens on (col, num), or [] if there is no such line."""
+        line = self._line_at.get((col, num))
+        return self.tokens[line.start : line.end] if line is not None else []
+
+    def line_words(self, col, num):
+        """Return the word strings on (col, num), parashah markers excluded."""
+        return [t.text for t in self.line_tokens(col, num) if not t.is_parashah]
+
+    def line_of_token(self, i):
+        """Return the Line holding token *i*, or None."""
+        li = self.token_line[i]
+        return self.lines[li] if li >= 0 else None
+
+
+def page_path(page):
+    """Return the line-breaks JSON path for a leaf ID or path."""
+    if isinstance(page, Path) or str(page).endswith(".json"):
+        return Path(page)
+    return LB_DIR / f"{page}.json"
+
+
+@lru_cache(maxsize=64)
+def _load_page_cached(path_str, mtime_ns, size):
+    path = Path(path_str)
+    stream = json.loads(path.read_text(encoding="utf-8"))
+    return Page(stream, name=path.stem)
+
+
+def load_page(page):
+    """Return the parsed Page for a leaf ID (e.g. "270r") or JSON path.
+
+    Pages are shared between callers and re-parsed only when the file's
+    mtime or size changes; callers must not mutate them (or their
+    streams).
+    """
+    path = page_path(page).resolve()
+    st = path.stat()
+    return _load_page_cached(str(path), st.st_mtime_ns, st.st_size)
@@ -0,0 +1,361 @@
+"""
+Pluggable consistency rules for line-break flat streams.
+
+check_stream() classifies each stream item once and, in a single pass,
+hands it to the rules that asked for that item class (Rule.handles).
+The traversal also keeps a running word count, so a rule that needs
+"how many words between these two markers" subtracts two prefix counts
+instead of re-slicing the stream. After the pass, each rule's finish()
+emits its issues and contributes its entries to the stats dict.
+
+Rules run, and report issues, in RULES order. Each rule keeps its own
+issue list and the time spent in it (Rule.elapsed). Adding a check is
+adding a Rule subclass to RULES; it never adds another pass.
+"""
+
+import time
+from collections import Counter
+
+EXPECTED_LINES_PER_COL = 28
+
+_CLASS_KEYS = (
+    "page-start",
+    "page-end",
+    "verse-start",
+    "verse-end",
+    "verse-fragment-start",
+    "verse-fragment-end",
+    "line-start",
+    "line-end",
+    "parashah",
+)
+
+VERSE_KEYS = (
+    "verse-start",
+    "verse-fragment-start",
+    "verse-end",
+    "verse-fragment-end",
+)
+
+
+def classify_item(item):
+    """Return a classification string for a stream item."""
+    if isinstance(item, str):
+        return "word"
+    if isinstance(item, dict):
+        for key in _CLASS_KEYS:
+            if key in item:
+                return key
+        return f"unknown-dict({sorted(item.keys())})"
+    return f"unknown-type({type(item).__name__})"
+
+
+class Context:
+    """Traversal state shared by all rules of one check_stream() call."""
+
+    def __init__(self):
+        self.classes = Counter()  # item class -> count
+        self.words = 0  # words seen so far (the prefix count), then total
+
+
+class Rule:
+    """Base class: one consistency check over a flat stream.
+
+    Subclasses set `handles` to the item classes they want to see and
+    override visit() and/or finish().
+    """
+
+    handles = ()
+
+    def __init__(self):
+        self.issues = []
+        self.elapsed = 0.0
+
+    def visit(self, idx, cls, item, ctx):
+        """Called for each item whose class is in `handles`.
+
+        ctx.words is the number of words before this item.
+        """
+
+    def finish(self, ctx, stats):
+        """Called after the pass; append issues and fill stats entries."""
+
+
+class PageMarkersRule(Rule):
+    """Exactly one page-start and one page-end."""
+
+    def finish(self, ctx, stats):
+        for key in ("page-start", "page-end"):
+            if ctx.classes[key] != 1:
+                self.issues.append(f"Expected 1 {key}, found {ctx.classes[key]}")
+
+
+class UnknownItemsRule(Rule):
+    """No items of unknown type."""
+
+    def finish(self, ctx, stats):
+        for key, count in ctx.classes.items():
+            if key.startswith("unknown"):
+                self.issues.append(f"Unknown item type: {key} (×{count})")
+
+
+class LinePairsRule(Rule):
+    """Every line-start has exactly one matching line-end and vice versa.
+
+    Reversed-order pairs (line-end before line-start) must be truly
+    empty (no words between them); those are reported as empty lines.
+    """
+
+    handles = ("line-start", "line-end")
+
+    def __init__(self):
+        super().__init__()
+        self.start_counts = Counter()  # (col, line-num) -> count
+        self.end_counts = Counter()
+        self.starts = {}  # (col, line-num) -> (last index, words before it)
+        self.ends = {}
+
+    def visit(self, idx, cls, item, ctx):
+        info = item[cls]
+        key = (info["col"], info["line-num"])
+        if cls == "line-start":
+            self.start_counts[key] += 1
+            self.starts[key] = (idx, ctx.words)
+        else:
+            self.end_counts[key] += 1
+            self.ends[key] = (idx, ctx.words)
+
+    def finish(self, ctx, stats):
+        issues = self.issues
+        for key in sorted(set(self.start_counts) | set(self.end_counts)):
+            sc = self.start_counts[key]
+            ec = self.end_counts[key]
+            if sc == 0:
+                issues.append(
+                    f"line-end(col={key[0]}, num={key[1]}) with no matching line-start"
+                )
+            elif sc > 1:
+                issues.append(
+                    f"line-start(col={key[0]}, num={key[1]}) appears {sc} times (expected 1)"
+                )
+            if ec == 0:
+                issues.append(
+                    f"line-start(col={key[0]}, num={key[1]}) with no matching line-end"
+                )
+            elif ec > 1:
+                issues.append(
+                    f"line-end(col={key[0]}, num={key[1]}) appears {ec} times (expected 1)"
+                )
+
+        empty_lines = []
+        for key in sorted(set(self.starts) & set(self.ends)):
+            s_idx, s_words = self.starts[key]
+            e_idx, e_words = self.ends[key]
+            if e_idx < s_idx:
+                n_between = s_words - e_words
+                if n_between:
+                    issues.append(
+                        f"line-end(col={key[0]}, num={key[1]}) comes before "
+                        f"line-start but {n_between} word(s) between them"
+                    )
+                else:
+                    empty_lines.append(key)
+        stats["empty_lines"] = empty_lines
+
+
+class ColumnLinesRule(Rule):
+    """N lines per column (by line-end markers), numbered 1..N."""
+
+    handles = ("line-end",)
+
+    def __init__(self):
+        super().__init__()
+        self.col_lines = {}  # col -> list of line-nums
+
+    def visit(self, idx, cls, item, ctx):
+        info = item["line-end"]
+        self.col_lines.setdefault(info["col"], []).append(info["line-num"])
+
+    def finish(self, ctx, stats):
+        for col in sorted(self.col_lines):
+            nums = self.col_lines[col]
+            n = len(nums)
+            if n != EXPECTED_LINES_PER_COL:
+                self.issues.append(
+                    f"Col {col}: {n} lines (expected {EXPECTED_LINES_PER_COL})"
+                )
+            expected_nums = list(range(1, n + 1))
+            if nums != expected_nums:
+                self.issues.append(
+                    f"Col {col}: line numbers are {nums}, " f"expected {expected_nums}"
+                )
+        stats["col_lines"] = {
+            col: len(nums) for col, nums in sorted(self.col_lines.items())
+        }
+
+
+class BoundaryWordsRule(Rule):
+    """No words before the first line-start or after the last line-end."""
+
+    handles = ("line-start", "line-end")
+
+    def __init__(self):
+        super().__init__()
+        self.words_before_first_start = None
+        self.words_before_last_end = None
+
+    def visit(self, idx, cls, item, ctx):
+        if cls == "line-start":
+            if self.words_before_first_start is None:
+                self.words_before_first_start = ctx.words
+        else:
+            self.words_before_last_end = ctx.words
+
+    def finish(self, ctx, stats):
+        if self.words_before_first_start:
+            self.issues.append(
+                f"{self.words_before_first_start} word(s) before first line-start"
+            )
+        if self.words_before_last_end is not None:
+            n_after = ctx.words - self.words_before_last_end
+            if n_after:
+                self.issues.append(f"{n_after} word(s) after last line-end")
+
+
+class ColumnsPresentRule(Rule):
+    """Both columns have line markers."""
+
+    handles = ("line-end",)
+
+    def __init__(self):
+        super().__init__()
+        self.cols = set()
+
+    def visit(self, idx, cls, item, ctx):
+        self.cols.add(item["line-end"]["col"])
+
+    def finish(self, ctx, stats):
+        for col in (1, 2):
+            if col not in self.cols:
+                self.issues.append(f"No col {col} line markers")
+
+
+class VerseLabelsRule(Rule):
+    """All verse identifiers are well-formed (Book C:V)."""
+
+    handles = VERSE_KEYS
+
+    def visit(self, idx, cls, item, ctx):
+        for key in VERSE_KEYS:
+            if key in item:
+                vs = item[key]
+                parts = vs.rsplit(" ", 1)
+                if len(parts) != 2 or ":" not in parts[1]:
+                    self.issues.append(f"Malformed {key}: {vs!r}")
+
+
+class VersePairsRule(Rule):
+    """Each verse-start has exactly one matching (fragment) end, and
+    each verse-end exactly one matching (fragment) start."""
+
+    handles = VERSE_KEYS
+
+    def __init__(self):
+        super().__init__()
+        self.start_counts = Counter()  # verse ID -> number of (fragment) starts
+        self.end_counts = Counter()  # verse ID -> number of (fragment) ends
+        self.verse_starts = set()
+        self.verse_ends = set()
+
+    def visit(self, idx, cls, item, ctx):
+        if "verse-start" in item:
+            self.verse_starts.add(item["verse-start"])
+            self.start_counts[item["verse-start"]] += 1
+        if "verse-fragment-start" in item:
+            self.start_counts[item["verse-fragment-start"]] += 1
+        if "verse-end" in item:
+            self.verse_ends.add(item["verse-end"])
+            self.end_counts[item["verse-end"]] += 1
+        if "verse-fragment-end" in item:
+            self.end_counts[item["verse-fragment-end"]] += 1
+
+    def finish(self, ctx, stats):
+        for v in sorted(self.verse_starts):
+            n = self.end_counts[v]
+            if n == 0:
+                self.issues.append(
+                    f"verse-start {v} has no matching verse-end or verse-fragment-end"
+                )
+            elif n > 1:
+                self.issues.append(
+                    f"verse-start {v} has {n} matching verse-end/verse-fragment-end markers (expected 1)"
+                )
+        for v in sorted(self.verse_ends):
+            n = self.start_counts[v]
+            if n == 0:
+                self.issues.append(
+                    f"verse-end {v} has no matching verse-start or verse-fragment-start"
+                )
+            elif n > 1:
+                self.issues.append(
+                    f"verse-end {v} has {n} matching verse-start/verse-fragment-start markers (expected 1)"
+                )
+        stats["file_verse_starts"] = self.verse_starts
+        stats["file_verse_ends"] = self.verse_ends
+
+
+# Rules in reporting order.
+RULES = [
+    PageMarkersRule,
+    UnknownItemsRule,
+    LinePairsRule,
+    ColumnLinesRule,
+    BoundaryWordsRule,
+    ColumnsPresentRule,
+    VerseLabelsRule,
+    VersePairsRule,
+]
+
+
+def check_stream(stream, rules=None):
+    """Run rules over a flat stream in one traversal.
+
+    Args:
+        stream: flat stream list from a line-break JSON file.
+        rules: Rule classes to run, in reporting order; defaults to RULES.
+
+    Returns:
+        (issues, stats, rules): all issues in rule order; the stats
+        entries contributed by the rules plus "words" and the item class
+        counts under "classes"; and the finished Rule instances (for
+        their per-rule issues and elapsed times).
+    """
+    rules = [cls() for cls in (rules or RULES)]
+    dispatch = {}  # item class -> rules that handle it
+    for rule in rules:
+        for cls in rule.handles:
+            dispatch.setdefault(cls, []).append(rule)
+
+    ctx = Context()
+    classes = ctx.classes
+    clock = time.perf_counter
+    for idx, item in enumerate(stream):
+        if type(item) is str:
+            classes["word"] += 1
+            ctx.words += 1
+            continue
+        cls = classify_item(item)
+        classes[cls] += 1
+        for rule in dispatch.get(cls, ()):
+            t0 = clock()
+            rule.visit(idx, cls, item, ctx)
+            rule.elapsed += clock() - t0
+
+    stats = {"words": ctx.words, "classes": classes}
+    issues = []
+    for rule in rules:
+        t0 = clock()
+        rule.finish(ctx, stats)
+        rule.elapsed += clock() - t0
+        issues.extend(rule.issues)
+    return issues, stats, rules
@@ -0,0 +1,326 @@
+"""
+Compact, memory-mappable word store for the whole MAM corpus.
+
+The dict-of-lists verse records from gen_mam_corpus cost one Python
+object per word, per verse and per key. This module packs the same data
+into flat arrays in a single binary file (.novc/mam-word-store.bin):
+
+  lex_offsets   uint32[n_lex + 1]   byte offsets into lex_bytes
+  lex_bytes     uint8[...]          UTF-8 of each distinct word, concatenated
+  tokens        uint32[n_tokens]    word id of every word, corpus order
+  verse_offsets uint32[n_verses + 1] first token of each verse
+  verse_keys    uint32[n_verses]    (chapter << 16) | verse
+  parashah      uint8[n_verses]     0 = none, else index into PARASHAH_VALUES
+  ketiv         uint8[...]          bitset over tokens (1 = ketiv)
+
+A JSON header records the section offsets, the per-book verse ranges
+and the source hashes of the corpus it was built from. The file is
+opened with mmap and the sections are exposed as typed memoryviews, so
+many processes can share one copy through the page cache and opening
+the store does no parsing at all.
+
+Usage:
+    from py_ac_loc.mam_word_store import open_store
+
+    store = open_store()
+    v0, v1 = store.verse_span("Job", (37, 9), (38, 20))
+    for vi in range(v0, v1):
+        print(store.verse_cv(vi), store.verse_words(vi))
+
+    python py_ac_loc/mam_word_store.py     # (re)build and print stats
+"""
+
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from py_ac_loc.gen_mam_corpus import _source_hashes, load_corpus
+
+BASE = Path(__file__).resolve().parent.parent
+STORE_PATH = BASE / ".novc" / "mam-word-store.bin"
+
+MAGIC = b"MAMWS\x00\x00\x01"
+STORE_VERSION = 1
+PARASHAH_VALUES = [None, "spi-pe2", "spi-samekh2"]
+
+# Section name -> array typecode, in file order.
+_SECTIONS = [
+    ("lex_offsets", "I"),
+    ("lex_bytes", "B"),
+    ("tokens", "I"),
+    ("verse_offsets", "I"),
+    ("verse_keys", "I"),
+    ("parashah", "B"),
+    ("ketiv", "B"),
+]
+
+
+def _verse_key(ch, vs):
+    return (ch << 16) | vs
+
+
+def build_store(corpus=None, path=STORE_PATH):
+    """Pack a corpus (see gen_mam_corpus) into a store file.
+
+    Args:
+        corpus: corpus dict; defaults to load_corpus().
+        path: output file.
+
+    Returns:
+        path.
+    """
+    if corpus is None:
+        corpus = load_corpus()
+
+    lex_ids = {}
+    lex_offsets = array("I", [0])
+    lex_bytes = bytearray()
+    tokens = array("I")
+    verse_offsets = array("I", [0])
+    verse_keys = array("I")
+    parashah = array("B")
+    ketiv_positions = []
+    books = []
+
+    for entry in corpus["books"]:
+        v_start = len(verse_keys)
+        for verse in entry["verses"]:
+            ch, vs = (int(x) for x in verse["cv"].split(":"))
+            base = len(tokens)
+            for word in verse["words"]:
+                wid = lex_ids.get(word)
+                if wid is None:
+                    wid = lex_ids[word] = len(lex_ids)
+                    lex_bytes += word.encode("utf-8")
+                    lex_offsets.append(len(lex_bytes))
+                tokens.append(wid)
+            ketiv_positions.extend(base + i for i in verse["ketiv_indices"])
+            verse_offsets.append(len(tokens))
+            verse_keys.append(_verse_key(ch, vs))
+            pb = verse["parashah_before"]
+            parashah.append(PARASHAH_VALUES.index(pb["parashah"] if pb else None))
+        books.append(
+            {
+                "book": entry["book"],
+                "verse_start": v_start,
+                "verse_end": len(verse_keys),
+            }
+        )
+
+    ketiv = bytearray((len(tokens) + 7) // 8)
+    for pos in ketiv_positions:
+        ketiv[pos >> 3] |= 1 << (pos & 7)
+
+    payloads = {
+        "lex_offsets": lex_offsets.tobytes(),
+        "lex_bytes": bytes(lex_bytes),
+        "tokens": tokens.tobytes(),
+        "verse_offsets": verse_offsets.tobytes(),
+        "verse_keys": verse_keys.tobytes(),
+        "parashah": parashah.tobytes(),
+        "ketiv": bytes(ketiv),
+    }
+
+    # Lay sections out after the header, each 8-byte aligned. The header
+    # size depends on the offsets it records, so settle it iteratively.
+    header = {}
+    header_len = 0
+    while True:
+        sections = {}
+        pos = _align(len(MAGIC) + 4 + header_len)
+        for name, _ in _SECTIONS:
+            sections[name] = [pos, len(payloads[name])]
+            pos = _align(pos + len(payloads[name]))
+        header = {
+            "version": STORE_VERSION,
+            "byteorder": sys.byteorder,
+            "sources": corpus["sources"],
+            "books": books,
+            "sections": sections,
+        }
+        encoded = json.dumps(header).encode("utf-8")
+        if len(encoded) <= header_len:
+            break
+        header_len = len(encoded) + 64  # slack, so offsets stay put
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", header_len))
+        f.write(encoded.ljust(header_len, b" "))
+        for name, _ in _SECTIONS:
+            offset = sections[name][0]
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(payloads[name])
+    os.replace(tmp_path, path)
+    return path
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+class WordStore:
+    """Read-only view of a store file through mmap.
+
+    Verses are addressed by a global verse index (corpus order) and
+    words by integer word id; nothing is materialized until asked for.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[: len(MAGIC)] != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} is not a MAM word store")
+        (header_len,) = struct.unpack_from("<I", self._mm, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.header = json.loads(self._mm[start : start + header_len])
+        if self.header["byteorder"] != sys.byteorder:
+            self._mm.close()
+            raise ValueError(
+                f"{path} was built on a {self.header['byteorder']}-endian machine"
+            )
+
+        buf = memoryview(self._mm)
+        self._views = [buf]
+        for name, typecode in _SECTIONS:
+            offset, length = self.header["sections"][name]
+            view = buf[offset : offset + length].cast(typecode)
+            self._views.append(view)
+            setattr(self, name, view)
+
+        self.books = {
+            b["book"]: (b["verse_start"], b["verse_end"]) for b in self.header["books"]
+        }
+        self._word_cache = {}
+
+    def close(self):
+        """Release the memoryviews and unmap the file.
+
+        Slices returned by tokens_in_range() (or taken from the section
+        views) share the mapping. If a caller still holds one, the file
+        cannot be unmapped yet; it is then left mapped, to be unmapped
+        when the last such slice is garbage-collected, rather than
+        raising BufferError here (e.g. on leaving a with block).
+        """
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        try:
+            self._mm.close()
+        except BufferError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def n_verses(self):
+        return len(self.verse_keys)
+
+    @property
+    def n_tokens(self):
+        return len(self.tokens)
+
+    def word(self, wid):
+        """Decode word id *wid* (memoized)."""
+        w = self._word_cache.get(wid)
+        if w is None:
+            a, b = self.lex_offsets[wid], self.lex_offsets[wid + 1]
+            w = self._word_cache[wid] = bytes(self.lex_bytes[a:b]).decode("utf-8")
+        return w
+
+    def verse_span(self, book, start_cv, end_cv):
+        """Return the [v0, v1) verse-index range of *book* in start_cv..end_cv.
+
+        Args:
+            book: OSIS book ID, e.g. 'Job'.
+            start_cv: (chapter, verse) tuple, inclusive.
+            end_cv: (chapter, verse) tuple, inclusive.
+        """
+        lo, hi = self.books[book]
+        end_ch, end_vs = (min(x, 0xFFFF) for x in end_cv)
+        v0 = bisect.bisect_left(self.verse_keys, _verse_key(*start_cv), lo, hi)
+        v1 = bisect.bisect_right(self.verse_keys, _verse_key(end_ch, end_vs), lo, hi)
+        return v0, max(v0, v1)
+
+    def token_span(self, v0, v1):
+        """Return the [t0, t1) token range covering verses v0..v1-1."""
+        return self.verse_offsets[v0], self.verse_offsets[v1]
+
+    def tokens_in_range(self, book, start_cv, end_cv):
+        """Return the word ids of a (book, cv range) as a zero-copy memoryview.
+
+        The view shares the store's mapping (see close()); copy it, e.g.
+        with array("I", view), to keep it past the store's lifetime.
+        """
+        t0, t1 = self.token_span(*self.verse_span(book, start_cv, end_cv))
+        return self.tokens[t0:t1]
+
+    def verse_cv(self, vi):
+        key = self.verse_keys[vi]
+        return f"{key >> 16}:{key & 0xFFFF}"
+
+    def verse_words(self, vi):
+        t0, t1 = self.token_span(vi, vi + 1)
+        return [self.word(wid) for wid in self.tokens[t0:t1]]
+
+    def is_ketiv(self, ti):
+        return bool(self.ketiv[ti >> 3] >> (ti & 7) & 1)
+
+    def parashah_before(self, vi):
+        value = PARASHAH_VALUES[self.parashah[vi]]
+        return {"parashah": value} if value else None
+
+    def verse_dict(self, vi):
+        """Materialize verse *vi* in the get_verses_in_range dict shape."""
+        t0, t1 = self.token_span(vi, vi + 1)
+        return {
+            "words": self.verse_words(vi),
+            "ketiv_indices": [i for i in range(t1 - t0) if self.is_ketiv(t0 + i)],
+            "cv": self.verse_cv(vi),
+            "parashah_before": self.parashah_before(vi),
+        }
+
+
+def open_store(path=STORE_PATH):
+    """Open the store, (re)building it first if missing or out of date."""
+    store = None
+    try:
+        store = WordStore(path)
+        if store.header["version"] == STORE_VERSION and (
+            store.header["sources"] == _source_hashes()
+        ):
+            return store
+    except (OSError, ValueError):
+        pass
+    if store is not None:
+        store.close()
+    build_store(path=path)
+    return WordStore(path)
+
+
+def main():
+    build_store()
+    with open_store() as store:
+        size = STORE_PATH.stat().st_size
+        print(
+            f"{STORE_PATH}: {len(store.books)} books, {store.n_verses} verses, "
+            f"{store.n_tokens} tokens, {len(store.lex_offsets) - 1} distinct words, "
+            f"{size / 1e6:.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -20,13 +20,51 @@ Usage:
     )
     # Returns: [{'cv': '37:9', 'words': [...], 'ketiv_indices': [], 'parashah_before': None}, ...]
     # parashah_before is None, {"parashah": "spi-pe2"}, or {"parashah": "spi-samekh2"}
+
+Extracted verse records are cached on disk under .novc/mam-xml-cache/,
+one JSON file per (XML file, book), keyed by the SHA-256 of the XML
+file. A warm cache turns a range lookup into a JSON load plus a filter;
+editing an XML file invalidates its entries automatically.
+
+iter_verses_in_range streams a range with incremental parsing instead,
+freeing each chapter as it goes and stopping at end_cv.
+
+get_verse reads a single verse through a byte-offset index kept under
+.novc/mam-xml-index/ (one per XML file, revalidated by mtime and size),
+decoding only that verse's bytes.
 """
 
+import hashlib
+import json
+import math
+import os
+import re
 import xml.etree.ElementTree as ET
+from pathlib import Path
 
 PASEQ = "\u05c0"
 MAQAF = "\u05be"
 
+SAMPE_TAG = {"pe2": "spi-pe2", "samekh2": "spi-samekh2"}
+
+CACHE_DIR = Path(__file__).resolve().parent.parent / ".novc" / "mam-xml-cache"
+
+# Bump whenever the extraction logic changes the verse records it
+# produces, so that stale cache files are ignored.
+CACHE_VERSION = 1
+
+INDEX_DIR = CACHE_DIR.parent / "mam-xml-index"
+INDEX_VERSION = 1
+
+# In-process memo: (resolved xml path, book prefix) -> (stat key, records)
+_book_memo = {}
+# In-process memo: resolved xml path -> (stat key, {osisID: (start, end)})
+_offsets_memo = {}
+
+# A <verse ...> start tag; attribute values may contain ">".
+_VERSE_TAG_RE = re.compile(rb'<verse\b((?:[^>"]|"[^"]*")*?)(/?)>')
+_OSIS_ID_RE = re.compile(rb'\sosisID="([^"]*)"')
+
 
 def get_verse_words(verse_el):
     """
@@ -123,7 +161,275 @@ def get_verse_words(verse_el):
     return {"words": merged, "ketiv_indices": ketiv_indices}
 
 
-def get_verses_in_range(xml_path, book_osis_prefix, start_cv, end_cv):
+def _verse_record(verse_el, ch, vs):
+    """Build the verse dict for a <verse> element (see get_verses_in_range)."""
+    result = get_verse_words(verse_el)
+    result["cv"] = f"{ch}:{vs}"
+
+    # Check for parashah break before this verse
+    sws = verse_el.attrib.get("starts-with-sampe")
+    if sws and sws in SAMPE_TAG:
+        result["parashah_before"] = {"parashah": SAMPE_TAG[sws]}
+    else:
+        result["parashah_before"] = None
+    return result
+
+
+def _iter_chapter_events(f):
+    """Incrementally parse a MAM-XML file, freeing each chapter when done.
+
+    Args:
+        f: binary file object positioned at the start of a MAM-XML file.
+
+    Yields:
+        ("chapter", book, ch, el) when a <chapter> starts, and
+        ("verse", book, ch, el) when a <verse> in it is complete. book is
+        the OSIS book prefix (e.g. 'Job') and ch the chapter number.
+    """
+    depth = 0
+    book_el = None
+    book = ch = None
+    for event, el in ET.iterparse(f, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            if el.tag == "book39":
+                book_el = el
+            elif el.tag == "chapter" and depth == 3:
+                osis = el.attrib.get("osisID", "")  # e.g., 'Job.37'
+                book, _, ch_str = osis.rpartition(".")
+                ch = int(ch_str)
+                yield "chapter", book, ch, el
+            continue
+
+        depth -= 1
+        if el.tag == "verse" and depth == 3:
+            yield "verse", book, ch, el
+        elif depth == 2 and book_el is not None:
+            # Finished a child of <book39> (chapter or between-chapter
+            # marker): free it.
+            el.clear()
+            book_el.remove(el)
+            book = ch = None
+
+
+def iter_verses_in_range(xml_path, book_osis_prefix, start_cv, end_cv):
+    """
+    Stream verses from a MAM-XML file in a chapter:verse range.
+
+    Uses incremental parsing instead of building the whole tree: each
+    <chapter> element is freed once it has been processed, and the file
+    is closed as soon as the range has been passed, so ranges near the
+    start of a book never read the rest of the file.
+
+    Args and yielded dicts are as for get_verses_in_range.
+    """
+    seen_book = False
+    with open(xml_path, "rb") as f:
+        for kind, book, ch, el in _iter_chapter_events(f):
+            if book != book_osis_prefix:
+                if seen_book:
+                    return  # target book finished
+                continue
+            seen_book = True
+            if kind == "chapter":
+                if ch > end_cv[0]:
+                    return
+                continue
+            if ch < start_cv[0]:
+                continue
+            vs = int(el.attrib["osisID"].split(".")[-1])
+            if (ch, vs) < start_cv:
+                continue
+            if (ch, vs) > end_cv:
+                return
+            yield _verse_record(el, ch, vs)
+            if (ch, vs) == end_cv:
+                return
+
+
+def iter_file_verses(xml_path):
+    """
+    Stream every verse of every book in a MAM-XML file, in one pass.
+
+    Args:
+        xml_path: path to the MAM-XML file (may hold several books,
+            e.g. 1Chr2Chr.xml).
+
+    Yields:
+        (book_osis_prefix, verse dict) pairs, with verse dicts as for
+        get_verses_in_range.
+    """
+    with open(xml_path, "rb") as f:
+        for kind, book, ch, el in _iter_chapter_events(f):
+            if kind == "verse":
+                vs = int(el.attrib["osisID"].split(".")[-1])
+                yield book, _verse_record(el, ch, vs)
+
+
+def _extract_book_verses(xml_path, book_osis_prefix):
+    """Extract every verse of one book from a MAM-XML file.
+
+    Args:
+        xml_path: path to the MAM-XML file.
+        book_osis_prefix: e.g., 'Job'
+
+    Returns:
+        list of verse dicts in document order, shaped as described in
+        get_verses_in_range.
+    """
+    everything = ((0, 0), (math.inf, math.inf))
+    return list(iter_verses_in_range(xml_path, book_osis_prefix, *everything))
+
+
+def _file_sha256(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def _cache_path(xml_path, book_osis_prefix):
+    return CACHE_DIR / f"{Path(xml_path).stem}.{book_osis_prefix}.json"
+
+
+def _read_cache(cache_path, sha):
+    """Return cached verse records, or None if missing or stale."""
+    try:
+        data = json.loads(cache_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != CACHE_VERSION or data.get("source_sha256") != sha:
+        return None
+    return data["verses"]
+
+
+def _write_cache(cache_path, sha, verses):
+    """Write verse records atomically (temp file + rename)."""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    payload = {"version": CACHE_VERSION, "source_sha256": sha, "verses": verses}
+    tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, cache_path)
+
+
+def load_book_verses(xml_path, book_osis_prefix, use_cache=True):
+    """Return every verse record of a book, using the on-disk cache.
+
+    Records are memoized per process (revalidated by file mtime and
+    size) and persisted under CACHE_DIR (revalidated by content hash).
+    The returned list is shared; callers must not mutate it.
+
+    Args:
+        xml_path: path to the MAM-XML file.
+        book_osis_prefix: e.g., 'Job'
+        use_cache: if False, always re-parse the XML and leave the
+            caches untouched.
+    """
+    if not use_cache:
+        return _extract_book_verses(xml_path, book_osis_prefix)
+
+    path = Path(xml_path).resolve()
+    st = path.stat()
+    stat_key = (st.st_mtime_ns, st.st_size)
+    memo_key = (str(path), book_osis_prefix)
+    memo = _book_memo.get(memo_key)
+    if memo is not None and memo[0] == stat_key:
+        return memo[1]
+
+    sha = _file_sha256(path)
+    cache_path = _cache_path(path, book_osis_prefix)
+    verses = _read_cache(cache_path, sha)
+    if verses is None:
+        verses = _extract_book_verses(path, book_osis_prefix)
+        _write_cache(cache_path, sha, verses)
+    _book_memo[memo_key] = (stat_key, verses)
+    return verses
+
+
+def _scan_verse_offsets(data):
+    """Map each verse osisID to the byte span of its <verse> element.
+
+    Args:
+        data: raw bytes of a MAM-XML file.
+    """
+    offsets = {}
+    pos = 0
+    while True:
+        m = _VERSE_TAG_RE.search(data, pos)
+        if m is None:
+            return offsets
+        if m.group(2):  # self-closing <verse ... />
+            end = m.end()
+        else:
+            end = data.index(b"</verse>", m.end()) + len(b"</verse>")
+        osis = _OSIS_ID_RE.search(m.group(1)).group(1).decode("utf-8")
+        offsets[osis] = (m.start(), end)
+        pos = end
+
+
+def load_verse_offsets(xml_path):
+    """Return the byte-offset index of a MAM-XML file, building it if needed.
+
+    The index maps verse osisID (e.g. 'Job.38.1') to the (start, end)
+    byte span of its <verse> element. It is memoized per process and
+    persisted under INDEX_DIR, both revalidated by file mtime and size.
+
+    Args:
+        xml_path: path to the MAM-XML file.
+    """
+    path = Path(xml_path).resolve()
+    st = path.stat()
+    stat_key = [st.st_mtime_ns, st.st_size]
+    memo = _offsets_memo.get(str(path))
+    if memo is not None and memo[0] == stat_key:
+        return memo[1]
+
+    index_path = INDEX_DIR / f"{path.stem}.json"
+    offsets = None
+    try:
+        data = json.loads(index_path.read_text(encoding="utf-8"))
+        if data.get("version") == INDEX_VERSION and data.get("source") == stat_key:
+            offsets = {k: tuple(v) for k, v in data["verses"].items()}
+    except (OSError, ValueError):
+        pass
+    if offsets is None:
+        offsets = _scan_verse_offsets(path.read_bytes())
+        INDEX_DIR.mkdir(parents=True, exist_ok=True)
+        payload = {"version": INDEX_VERSION, "source": stat_key, "verses": offsets}
+        tmp_path = index_path.with_name(f"{index_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(payload), encoding="utf-8")
+        os.replace(tmp_path, index_path)
+    _offsets_memo[str(path)] = (stat_key, offsets)
+    return offsets
+
+
+def get_verse(xml_path, book_osis_prefix, cv):
+    """
+    Extract a single verse, reading only that verse's bytes.
+
+    Args:
+        xml_path: path to the MAM-XML file.
+        book_osis_prefix: e.g., 'Job'
+        cv: (chapter, verse) tuple
+
+    Returns:
+        a verse dict as described in get_verses_in_range, or None if the
+        file has no such verse.
+    """
+    ch, vs = cv
+    span = load_verse_offsets(xml_path).get(f"{book_osis_prefix}.{ch}.{vs}")
+    if span is None:
+        return None
+    start, end = span
+    with open(xml_path, "rb") as f:
+        f.seek(start)
+        verse_el = ET.fromstring(f.read(end - start))
+    return _verse_record(verse_el, ch, vs)
+
+
+def _cv_tuple(cv):
+    ch, vs = cv.split(":")
+    return int(ch), int(vs)
+
+
+def get_verses_in_range(xml_path, book_osis_prefix, start_cv, end_cv, use_cache=True):
     """
     Extract verses from a MAM-XML file in a chapter:verse range.
 
@@ -132,6 +438,10 @@ def get_verses_in_range(xml_path, book_osis_prefix, start_cv, end_cv):
         book_osis_prefix: e.g., 'Job'
         start_cv: (chapter, verse) tuple, inclusive
         end_cv: (chapter, verse) tuple, inclusive
+        use_cache: if True (default), serve from the pre-parsed book
+            cache (see load_book_verses); if False, stream just the
+            requested range from the XML (see iter_verses_in_range).
+            Single-verse ranges always go through get_verse.
 
     Returns:
         list of dicts, each with:
@@ -141,37 +451,51 @@ def get_verses_in_range(xml_path, book_osis_prefix, start_cv, end_cv):
             parashah_before: None or {"parashah": "spi-pe2"} or {"parashah": "spi-samekh2"}
                 — parashah break before this verse (from starts-with-sampe attribute)
     """
-    tree = ET.parse(xml_path)
-    book39 = tree.getroot()[0]
+    if start_cv == end_cv:
+        verse = get_verse(xml_path, book_osis_prefix, start_cv)
+        return [verse] if verse is not None else []
+    if not use_cache:
+        return list(iter_verses_in_range(xml_path, book_osis_prefix, start_cv, end_cv))
+    book_verses = load_book_verses(xml_path, book_osis_prefix)
+    # Shallow copies: callers add keys (e.g. "book") to the dicts they get.
+    return [dict(v) for v in book_verses if start_cv <= _cv_tuple(v["cv"]) <= end_cv]
 
-    sampe_tag = {"pe2": "spi-pe2", "samekh2": "spi-samekh2"}
 
-    verses = []
-    for child in book39:
-        if child.tag != "chapter":
-            continue
-        osis = child.attrib.get("osisID", "")  # e.g., 'Job.37'
-        if not osis.startswith(book_osis_prefix + "."):
-            continue
-        ch = int(osis.split(".")[-1])
+def get_verses_in_ranges(ranges, use_cache=True):
+    """
+    Extract verses for many chapter:verse ranges, reading each book once.
 
-        for v in child:
-            if v.tag != "verse":
-                continue
-            v_osis = v.attrib["osisID"]
-            vs = int(v_osis.split(".")[-1])
-            if (ch, vs) < start_cv or (ch, vs) > end_cv:
-                continue
-            result = get_verse_words(v)
-            result["cv"] = f"{ch}:{vs}"
+    Ranges are grouped by (file, book). Each group is served from one
+    load_book_verses call, or, with use_cache=False, from one streaming
+    pass covering the union of its ranges.
 
-            # Check for parashah break before this verse
-            sws = v.attrib.get("starts-with-sampe")
-            if sws and sws in sampe_tag:
-                result["parashah_before"] = {"parashah": sampe_tag[sws]}
-            else:
-                result["parashah_before"] = None
+    Args:
+        ranges: iterable of (xml_path, book_osis_prefix, start_cv, end_cv)
+            tuples, with arguments as for get_verses_in_range.
+        use_cache: as for get_verses_in_range.
 
-            verses.append(result)
+    Returns:
+        list with one verse list per range, in request order.
+    """
+    ranges = list(ranges)
+    groups = {}  # (resolved path, prefix) -> list of range indices
+    for i, (xml_path, prefix, _, _) in enumerate(ranges):
+        key = (str(Path(xml_path).resolve()), prefix)
+        groups.setdefault(key, []).append(i)
 
-    return verses
+    results = [[] for _ in ranges]
+    for (xml_path, prefix), idxs in groups.items():
+        lo = min(ranges[i][2] for i in idxs)
+        hi = max(ranges[i][3] for i in idxs)
+        if use_cache:
+            book_verses = load_book_verses(xml_path, prefix)
+        else:
+            book_verses = iter_verses_in_range(xml_path, prefix, lo, hi)
+        for v in book_verses:
+            cv = _cv_tuple(v["cv"])
+            if not lo <= cv <= hi:
+                continue
+            for i in idxs:
+                if ranges[i][2] <= cv <= ranges[i][3]:
+                    results[i].append(dict(v))
+    return results
@@ -0,0 +1,171 @@
+"""
+Table-driven check that Hebrew combining marks follow the project's
+standard group order (see mark_group), over any number of words at once.
+
+Every code point is mapped through a lookup table to a one-character
+group code: "." for a base (non-combining) character, "0".."5" for a
+combining mark. All words are joined with a separator (coded "|") and
+translated in one str.translate call, so the marks on each base letter
+become a run of digits after a ".". A run is out of order exactly when
+some digit is followed by a smaller one, which a single regex scan over
+the whole translated corpus finds. Only the (rare) offending words are then
+re-examined to build a detailed message.
+
+All violations are reported, with verse labels, rather than stopping at
+the first one.
+
+Usage:
+    python py_ac_loc/mark_order.py      # validate the whole MAM corpus
+"""
+
+import bisect
+import re
+import sys
+import unicodedata
+from pathlib import Path
+
+
+def mark_group(cp):
+    """Group number for Hebrew combining marks (project standard order).
+
+    Only inter-group ordering is enforced. Within the accent group,
+    MAM-XML’s order is accepted as-is.
+
+    Args:
+        cp: integer code point of a combining character.
+    """
+    if cp in (0x05C1, 0x05C2):  # shin/sin dot
+        return 0
+    if cp == 0x05BC:  # dagesh
+        return 1
+    if cp == 0x05BF:  # rafeh
+        return 2
+    if 0x05B0 <= cp <= 0x05BB or cp == 0x05C7:  # vowels
+        return 3
+    if cp == 0x05BD:  # meteg
+        return 4
+    return 5  # accents (cantillation marks)
+
+
+class _GroupTable(dict):
+    """str.translate table: code point -> group code, filled on demand."""
+
+    def __missing__(self, cp):
+        code = "." if unicodedata.combining(chr(cp)) == 0 else str(mark_group(cp))
+        self[cp] = code
+        return code
+
+
+_GROUP_TABLE = _GroupTable()
+for _cp in range(0x0590, 0x0600):  # precompute the Hebrew block
+    _GROUP_TABLE[_cp]
+del _cp
+
+_SEPARATOR = "\n"
+_GROUP_TABLE[ord(_SEPARATOR)] = "|"
+
+# A base letter whose mark run contains an adjacent pair of group codes
+# in decreasing order. (Marks before a word's first base letter are not
+# checked.)
+_DESCENT_RE = re.compile(r"\.[0-5]*?(?:10|2[01]|3[0-2]|4[0-3]|5[0-4])")
+
+
+def _describe(word, verse_label):
+    """Build the detailed message for the first bad mark run in *word*."""
+    i = 0
+    while i < len(word):
+        if unicodedata.combining(word[i]) == 0:
+            marks = []
+            j = i + 1
+            while j < len(word) and unicodedata.combining(word[j]) != 0:
+                marks.append(word[j])
+                j += 1
+            max_group_seen = -1
+            for m in marks:
+                g = mark_group(ord(m))
+                if g < max_group_seen:
+                    marks_str = " ".join(f"U+{ord(x):04X}" for x in marks)
+                    return (
+                        f"Non-standard combining mark order in {verse_label}, "
+                        f"word '{word}': group {g} mark U+{ord(m):04X} "
+                        f"appears after group {max_group_seen}. "
+                        f"Marks: [{marks_str}]"
+                    )
+                max_group_seen = max(max_group_seen, g)
+            i = j
+        else:
+            i += 1
+    return f"Non-standard combining mark order in {verse_label}, word '{word}'"
+
+
+def find_order_violations(items):
+    """Find every word whose combining marks are out of standard group order.
+
+    Args:
+        items: iterable of (verse_label, word) pairs, e.g.
+            ("Job 38:1", "וַיַּֽעַן־").
+
+    Returns:
+        list of (verse_label, word, message) tuples, in input order, one
+        per offending word.
+    """
+    labels = []
+    words = []
+    for label, word in items:
+        labels.append(label)
+        words.append(word)
+    if not words:
+        return []
+
+    starts = []
+    pos = 0
+    for w in words:
+        starts.append(pos)
+        pos += len(w) + len(_SEPARATOR)
+    codes = _SEPARATOR.join(words).translate(_GROUP_TABLE)
+
+    violations = []
+    last_bad = -1
+    for m in _DESCENT_RE.finditer(codes):
+        k = bisect.bisect_right(starts, m.start()) - 1
+        if k != last_bad:
+            last_bad = k
+            violations.append((labels[k], words[k], _describe(words[k], labels[k])))
+    return violations
+
+
+def assert_standard_order(items):
+    """Raise AssertionError listing every mark-order violation in *items*.
+
+    Args:
+        items: iterable of (verse_label, word) pairs.
+    """
+    violations = find_order_violations(items)
+    if violations:
+        lines = [msg for _, _, msg in violations]
+        raise AssertionError(
+            f"{len(violations)} word(s) with non-standard combining mark "
+            f"order:\n  " + "\n  ".join(lines)
+        )
+
+
+def main():
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from py_ac_loc.gen_mam_corpus import load_corpus
+
+    corpus = load_corpus()
+    items = [
+        (f"{b['book']} {v['cv']}", w)
+        for b in corpus["books"]
+        for v in b["verses"]
+        for w in v["words"]
+    ]
+    violations = find_order_violations(items)
+    for _, _, msg in violations:
+        print(msg)
+    print(f"Checked {len(items)} words: {len(violations)} violation(s)")
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,53 +3,70 @@ Merge line-break markers from an edited flat-stream export back
 into the original flat-stream JSON, preserving original Hebrew strings.
 
 The edited JSON may have been Unicode-normalized during the
-clipboard/browser/chat pipeline.  This script:
+clipboard/browser/chat pipeline, and may even differ from the original
+by a few words (a word dropped, doubled or mistyped in transit).  This
+script:
 
 1. Reads the original JSON (pristine strings from gen_flat_stream).
 2. Reads the edited JSON (may have normalized strings).
 3. Strips line-start/line-end from the original to get a "base" stream.
-4. Walks the edited stream, matching words by NFC-normalized comparison.
-5. Records where line-start/line-end dicts appear relative to word indices.
+4. Aligns the edited words to the base words by NFC-normalized
+   comparison (Myers diff, see word_align.diff_opcodes), reporting any
+   words that differ.
+5. Records where line-start/line-end dicts appear relative to word
+   indices, carried over to the aligned base word indices.
 6. Inserts those dicts into the base stream at the matching positions.
-7. Writes the result back to the original file.
+7. Writes the result back to the original file (atomically), unless it
+   is unchanged.
+
+An edited file may also be a bundle of several pages, i.e. their flat
+streams concatenated; it is split at the page-start markers.
 
 Usage:
     python py_ac_loc/merge_line_markers.py 270v
     python py_ac_loc/merge_line_markers.py 270v .novc/edited_270v.json
+    python py_ac_loc/merge_line_markers.py 270v 271r 271v
+    python py_ac_loc/merge_line_markers.py --bundle .novc/edited_bundle.json
 """
 
 import json
+import os
 import sys
-import unicodedata
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from py_ac_loc.hebrew_norm import normalize
+from py_ac_loc.line_break_page import Page
+from py_ac_loc.word_align import diff_opcodes
+
 BASE = Path(__file__).resolve().parent.parent
 LB_DIR = BASE / "py_ac_loc" / "line-breaks"
 NOVC_DIR = BASE / ".novc"
 
+MAX_DIFF_WORDS = 20  # more differing words than this: wrong file, not typos
+
 
 def nfc(s):
-    """NFC-normalize a string for comparison."""
-    return unicodedata.normalize("NFC", s)
+    """NFC-normalize a string for comparison (memoized per distinct word)."""
+    return normalize(s, "nfc")
 
 
 def extract_words(stream):
     """Extract (index, text) of every string/parashah element in order."""
-    words = []
-    for item in stream:
-        if isinstance(item, str):
-            words.append(item)
-        elif isinstance(item, dict) and "parashah" in item:
-            words.append(item)  # parashah is a "word" for indexing
-    return words
+    # Page tokens are the strings and parashah markers; a parashah is a
+    # "word" for indexing.
+    return [stream[t.item_idx] for t in Page(stream).tokens]
 
 
-def extract_line_markers_by_word_idx(edited_stream):
+def extract_line_markers_by_word_idx(edited_stream, word_map=None):
     """Walk the edited stream and record line markers relative to word index.
 
     Args:
         edited_stream: flat stream list that may contain line-start and
             line-end marker dicts interspersed with word strings.
+        word_map: optional list mapping each edited word boundary (the
+            number of edited words before a marker) to a base word
+            boundary; see align_words. Defaults to the identity.
 
     Returns:
         before: dict mapping word_idx → list of dicts to insert BEFORE that word.
@@ -57,75 +74,106 @@ def extract_line_markers_by_word_idx(edited_stream):
     """
     before = {}  # word_idx -> [marker, ...]
     after = {}  # word_idx -> [marker, ...]
-    word_idx = 0
-    pending_before = []  # markers seen since last word (to attach to NEXT word)
-
-    for item in edited_stream:
-        if isinstance(item, str) or (isinstance(item, dict) and "parashah" in item):
-            # This is a word
-            if pending_before:
-                before.setdefault(word_idx, []).extend(pending_before)
-                pending_before = []
-            word_idx += 1
-        elif isinstance(item, dict):
-            if "line-start" in item or "line-end" in item:
-                if word_idx == 0:
-                    # Before any word
-                    pending_before.append(item)
-                else:
-                    # Decide: line-start goes BEFORE the next word,
-                    # line-end goes AFTER the previous word.
-                    if "line-end" in item:
-                        after.setdefault(word_idx - 1, []).extend([item])
-                    else:
-                        # line-start: attach to next word
-                        pending_before.append(item)
-            # other dicts (verse-start, verse-end, page-start, page-end): skip
-
+    for word_idx, item in Page(edited_stream).markers:
+        if word_map is not None:
+            word_idx = word_map[word_idx]
+        # line-end goes AFTER the previous word; line-start (or anything
+        # before the first word) goes BEFORE the next word.
+        if "line-end" in item and word_idx > 0:
+            after.setdefault(word_idx - 1, []).append(item)
+        else:
+            before.setdefault(word_idx, []).append(item)
     return before, after
 
 
-def verify_words_match(orig_words, edited_words):
-    """Verify that original and edited word lists match under NFC normalization.
+def _word_key(word):
+    """Comparison key of a word (string or parashah dict)."""
+    if isinstance(word, str):
+        return nfc(word)
+    return json.dumps(word, sort_keys=True, ensure_ascii=False)
+
+
+def align_words(orig_words, edited_words):
+    """Align edited words to original words under NFC normalization.
 
     Args:
         orig_words: word list extracted from the original (pristine) stream.
         edited_words: word list extracted from the edited stream (may have
             been Unicode-normalized during the clipboard/browser pipeline).
-    """
-    if len(orig_words) != len(edited_words):
-        print(
-            f"ERROR: Word count mismatch: original={len(orig_words)}, edited={len(edited_words)}"
-        )
-        sys.exit(1)
 
-    mismatches = []
-    for i, (ow, ew) in enumerate(zip(orig_words, edited_words)):
-        # Both might be parashah dicts or strings
-        if isinstance(ow, dict) and isinstance(ew, dict):
-            if ow != ew:
-                mismatches.append((i, repr(ow), repr(ew)))
-        elif isinstance(ow, str) and isinstance(ew, str):
-            if nfc(ow) != nfc(ew):
-                mismatches.append((i, ow, ew))
-        else:
-            mismatches.append((i, repr(ow), repr(ew)))
+    Returns:
+        (word_map, diffs): word_map[j] is the original word boundary that
+        edited boundary j (before edited word j; len(edited_words) is the
+        end) corresponds to; diffs lists the non-matching stretches as
+        (tag, orig_idx, edited_idx, orig_words, edited_words), tag being
+        "replace", "delete" (only in the original) or "insert" (only in
+        the edited).
+    """
+    ids = {}
+    a = [ids.setdefault(_word_key(w), len(ids)) for w in orig_words]
+    b = [ids.setdefault(_word_key(w), len(ids)) for w in edited_words]
+    word_map = [0] * (len(edited_words) + 1)
+    diffs = []
+    prev_tag = "equal"
+    for tag, i1, i2, j1, j2 in diff_opcodes(a, b):
+        # Inside a replaced stretch, boundaries map one-to-one as far as
+        # the original has words, then stick to the left edge of the
+        # words the edited stream lacks. The equal stretch that follows
+        # starts at the same edited boundary and must not move it past
+        # them: a marker there (e.g. the line-start before a dropped
+        # line-initial word) would carry the dropped words to the end of
+        # the previous line.
+        start = j1 + 1 if tag == "equal" and prev_tag != "equal" else j1
+        for j in range(start, j2 + 1):
+            word_map[j] = i1 + min(j - j1, i2 - i1)
+        if tag != "equal":
+            diffs.append((tag, i1, j1, orig_words[i1:i2], edited_words[j1:j2]))
+        prev_tag = tag
+    return word_map, diffs
+
+
+def report_alignment(orig_words, edited_words, diffs, marker_boundaries=()):
+    """Print the word discrepancies found by align_words.
 
-    if mismatches:
-        print(f"ERROR: {len(mismatches)} word mismatches:")
-        for idx, o, e in mismatches[:10]:
-            print(f"  [{idx}] original: {o}")
-            print(f"       edited:   {e}")
-        sys.exit(1)
+    Args:
+        marker_boundaries: edited word boundaries that have a line marker
+            (see extract_line_markers_by_word_idx); a stretch whose
+            original words are missing from the edited stream at such a
+            boundary is flagged, since which line they belong to is a
+            guess (they are kept after the markers, i.e. on the next line).
+
+    Raises:
+        ValueError: if more than MAX_DIFF_WORDS words differ (most likely
+            the edited file is for another page).
+    """
+    n_diff = sum(max(len(ow), len(ew)) for _, _, _, ow, ew in diffs)
+    if n_diff > MAX_DIFF_WORDS:
+        raise ValueError(
+            f"{n_diff} words differ (original={len(orig_words)}, "
+            f"edited={len(edited_words)} words); not merging"
+        )
+    if diffs:
+        print(f"  WARNING: {n_diff} word(s) differ; line markers carried across:")
+        for tag, idx, edited_idx, ow, ew in diffs:
+            print(f"  [{idx}] {tag}")
+            print(f"       original: {' '.join(map(str, ow))}")
+            print(f"       edited:   {' '.join(map(str, ew))}")
+            dropped_at = edited_idx + len(ew)  # boundary before the missing words
+            if len(ow) > len(ew) and dropped_at in marker_boundaries:
+                print(
+                    "       CHECK: missing word(s) at a line break; "
+                    "placed after its line marker(s)"
+                )
 
     # Check if any normalization actually happened
     norm_count = 0
     for ow, ew in zip(orig_words, edited_words):
         if isinstance(ow, str) and isinstance(ew, str) and ow != ew:
-            norm_count += 1
+            if nfc(ow) == nfc(ew):
+                norm_count += 1
     if norm_count:
         print(f"  {norm_count} words differ in raw form (but match under NFC)")
-    else:
+    elif not diffs:
         print("  All words match exactly (no normalization detected)")
 
 
@@ -141,6 +189,9 @@ def merge(orig_stream, edited_stream):
     Returns:
         The merged stream: original strings with line markers from the
         edited stream inserted at the corresponding positions.
+
+    Raises:
+        ValueError: if the edited words differ too much from the original.
     """
     # Strip existing line markers from original
     base_stream = [
@@ -149,13 +200,15 @@ def merge(orig_stream, edited_stream):
         if not (isinstance(item, dict) and ("line-start" in item or "line-end" in item))
     ]
 
-    # Extract words from both
+    # Extract words from both and align them
     orig_words = extract_words(base_stream)
     edited_words = extract_words(edited_stream)
-    verify_words_match(orig_words, edited_words)
+    word_map, diffs = align_words(orig_words, edited_words)
+    marker_boundaries = {word_idx for word_idx, _ in Page(edited_stream).markers}
+    report_alignment(orig_words, edited_words, diffs, marker_boundaries)
 
     # Extract line marker positions from edited
-    before, after = extract_line_markers_by_word_idx(edited_stream)
+    before, after = extract_line_markers_by_word_idx(edited_stream, word_map)
 
     # Rebuild: walk base_stream, inserting line markers at right positions
     result = []
@@ -180,45 +233,113 @@ def merge(orig_stream, edited_stream):
     return result
 
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python py_ac_loc/merge_line_markers.py <page_id> [edited.json]")
-        sys.exit(1)
+def split_bundle(stream):
+    """Split a bundle of concatenated page streams at page-start markers.
 
-    page_id = sys.argv[1]
-    orig_path = LB_DIR / f"{page_id}.json"
-    if not orig_path.exists():
-        print(f"ERROR: {orig_path} not found")
-        sys.exit(1)
+    Returns:
+        list of (page_id, stream); a stream without page-start markers is
+        one page with page_id None.
+    """
+    pages = []
+    for item in stream:
+        if isinstance(item, dict) and "page-start" in item:
+            pages.append((item["page-start"], []))
+        elif not pages:
+            pages.append((None, []))
+        pages[-1][1].append(item)
+    return pages
+
+
+def _write_json_atomic(path, data):
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(
+        json.dumps(data, indent=2, ensure_ascii=False) + "\n",
+        encoding="utf-8",
+    )
+    os.replace(tmp_path, path)
 
-    if len(sys.argv) >= 3:
-        edited_path = Path(sys.argv[2])
-    else:
-        edited_path = NOVC_DIR / f"edited_{page_id}.json"
 
-    if not edited_path.exists():
-        print(f"ERROR: {edited_path} not found")
-        sys.exit(1)
+def merge_page(page_id, edited_path=None, edited_stream=None):
+    """Merge an edited export into py_ac_loc/line-breaks/<page_id>.json.
+
+    The file is rewritten atomically, and only if the merge changes it.
+
+    Args:
+        page_id: leaf identifier, e.g. "270v".
+        edited_path: edited JSON; defaults to .novc/edited_<page_id>.json.
+        edited_stream: the edited flat stream itself (e.g. one page of a
+            bundle); if given, edited_path is not read.
+
+    Returns:
+        Path of the line-break file.
+
+    Raises:
+        ValueError: if a file is missing or the words differ too much.
+    """
+    orig_path = LB_DIR / f"{page_id}.json"
+    if not orig_path.exists():
+        raise ValueError(f"{orig_path} not found")
 
     print(f"Original: {orig_path}")
-    print(f"Edited:   {edited_path}")
+    if edited_stream is None:
+        if edited_path is None:
+            edited_path = NOVC_DIR / f"edited_{page_id}.json"
+        if not edited_path.exists():
+            raise ValueError(f"{edited_path} not found")
+        print(f"Edited:   {edited_path}")
+        edited_stream = json.loads(edited_path.read_text(encoding="utf-8"))
 
     orig_stream = json.loads(orig_path.read_text(encoding="utf-8"))
-    edited_stream = json.loads(edited_path.read_text(encoding="utf-8"))
-
     merged = merge(orig_stream, edited_stream)
+    if merged == orig_stream:
+        print(f"Unchanged {orig_path}")
+        return orig_path
 
-    # Write back
-    orig_path.write_text(
-        json.dumps(merged, indent=2, ensure_ascii=False) + "\n",
-        encoding="utf-8",
-    )
+    _write_json_atomic(orig_path, merged)
 
     # Stats
     line_starts = sum(1 for x in merged if isinstance(x, dict) and "line-start" in x)
     line_ends = sum(1 for x in merged if isinstance(x, dict) and "line-end" in x)
     print(f"Wrote {orig_path}")
     print(f"  {line_starts} line-start markers, {line_ends} line-end markers")
+    return orig_path
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or (args[0] == "--bundle" and len(args) != 2):
+        print(
+            "Usage: python py_ac_loc/merge_line_markers.py <page_id> [edited.json] ..."
+        )
+        print("       python py_ac_loc/merge_line_markers.py --bundle <edited.json>")
+        sys.exit(1)
+
+    # (page_id, edited_path, edited_stream) per page to merge
+    jobs = []
+    if args[0] == "--bundle":
+        bundle_path = Path(args[1])
+        bundle = json.loads(bundle_path.read_text(encoding="utf-8"))
+        print(f"Bundle:   {bundle_path}")
+        for page_id, stream in split_bundle(bundle):
+            jobs.append((page_id, None, stream))
+    else:
+        for arg in args:
+            if arg.endswith(".json") and jobs:
+                jobs[-1] = (jobs[-1][0], Path(arg), None)
+            else:
+                jobs.append((arg, None, None))
+
+    n_failed = 0
+    for page_id, edited_path, stream in jobs:
+        try:
+            if page_id is None:
+                raise ValueError("bundle stream has no page-start marker")
+            merge_page(page_id, edited_path, stream)
+        except ValueError as e:
+            print(f"ERROR: {page_id}: {e}")
+            n_failed += 1
+    if n_failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
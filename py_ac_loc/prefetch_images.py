@@ -0,0 +1,236 @@
+"""
+Download many page images into the shared image store, concurrently.
+
+Before a batch run (e.g. kraken_seg_baselines.py over the 24 Job pages)
+or a preview session, prefetch() fills the image store for a set of
+leaves instead of each tool downloading them one by one on demand:
+
+  - a bounded thread pool (max_workers) downloads leaves in parallel;
+  - each worker thread keeps one keep-alive HTTP(S) connection per host
+    and reuses it for all its requests (redirects are followed, e.g.
+    archive.org's BookReader redirecting to the serving data node);
+  - a token bucket shared by all workers limits the request rate;
+  - failed requests (connection errors, 429 and 5xx responses) are
+    retried with exponential backoff plus jitter.
+
+Leaves already in the store are not requested at all. The URL template
+is a parameter, so prefetch() can be pointed at a local HTTP server
+(check_prefetch_images.py does so).
+
+Usage:
+    python py_ac_loc/prefetch_images.py                 # all Job pages
+    python py_ac_loc/prefetch_images.py 270r 275v --scale 1
+    python py_ac_loc/prefetch_images.py --workers 4 --rate 2
+"""
+
+import http.client
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from py_ac_loc.image_store import IMAGE_BASE_URL, default_store, leaf_to_page_n
+
+ALL_PAGES = [f"{leaf}{side}" for leaf in range(270, 282) for side in ("r", "v")]
+
+DEFAULT_WORKERS = 4
+DEFAULT_RATE = 2.0  # requests per second, across all workers
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0  # seconds; doubled on each retry
+MAX_REDIRECTS = 5
+TIMEOUT = 60  # seconds, per connection attempt and read
+
+
+class TokenBucket:
+    """Thread-safe token bucket: at most *rate* acquisitions per second
+    on average, with bursts of up to *burst*."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.last) * self.rate
+                )
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RetryableError(Exception):
+    """A download failure worth retrying (server busy or erroring)."""
+
+
+class Fetcher:
+    """HTTP GET with per-thread keep-alive connections, rate limit and retries."""
+
+    def __init__(self, rate=DEFAULT_RATE, max_retries=MAX_RETRIES):
+        self.bucket = TokenBucket(rate) if rate else None
+        self.max_retries = max_retries
+        self.local = threading.local()  # .conns: (scheme, netloc) -> connection
+
+    def _connection(self, scheme, netloc):
+        conns = self.local.__dict__.setdefault("conns", {})
+        conn = conns.get((scheme, netloc))
+        if conn is None:
+            cls = (
+                http.client.HTTPSConnection
+                if scheme == "https"
+                else http.client.HTTPConnection
+            )
+            conn = conns[(scheme, netloc)] = cls(netloc, timeout=TIMEOUT)
+        return conn
+
+    def _drop_connection(self, scheme, netloc):
+        conn = self.local.__dict__.get("conns", {}).pop((scheme, netloc), None)
+        if conn is not None:
+            conn.close()
+
+    def _get_once(self, url):
+        """One GET (following redirects); returns the body bytes."""
+        for _ in range(MAX_REDIRECTS + 1):
+            if self.bucket is not None:
+                self.bucket.acquire()
+            parts = urlsplit(url)
+            path = parts.path or "/"
+            if parts.query:
+                path += "?" + parts.query
+            conn = self._connection(parts.scheme, parts.netloc)
+            try:
+                conn.request("GET", path, headers={"User-Agent": "Mozilla/5.0"})
+                resp = conn.getresponse()
+                body = resp.read()
+            except (OSError, http.client.HTTPException) as e:
+                self._drop_connection(parts.scheme, parts.netloc)
+                raise RetryableError(f"{type(e).__name__}: {e}") from e
+            if resp.will_close:
+                self._drop_connection(parts.scheme, parts.netloc)
+            if resp.status in (301, 302, 303, 307, 308):
+                url = urljoin(url, resp.getheader("Location"))
+                continue
+            if resp.status == 200:
+                return body
+            if resp.status == 429 or resp.status >= 500:
+                raise RetryableError(f"HTTP {resp.status}")
+            raise OSError(f"HTTP {resp.status} for {url}")
+        raise OSError(f"Too many redirects for {url}")
+
+    def get(self, url):
+        """GET *url*, retrying with exponential backoff; return the body."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._get_once(url)
+            except RetryableError as e:
+                if attempt == self.max_retries:
+                    raise OSError(f"{e} for {url} (gave up)") from e
+                delay = BACKOFF_BASE * 2**attempt * random.uniform(0.5, 1.5)
+                print(f"  {e}; retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+
+def prefetch(
+    page_ids,
+    scale=2,
+    max_workers=DEFAULT_WORKERS,
+    rate=DEFAULT_RATE,
+    url_template=IMAGE_BASE_URL,
+    store=None,
+):
+    """Make sure the image store holds every leaf in *page_ids* at *scale*.
+
+    Args:
+        page_ids: leaf identifiers, e.g. ["270r", "270v"].
+        scale: archive.org scale (1 = full size, 2 = half, ...).
+        max_workers: number of concurrent downloads.
+        rate: maximum requests per second over all workers (None: no limit).
+        url_template: str.format template with {n} (archive.org page
+            index, see image_store.leaf_to_page_n), {page_id} and {scale}.
+        store: image_store.ImageStore; defaults to the shared store.
+
+    Returns:
+        (downloaded, failed): leaves downloaded, and {leaf: error message}
+        for leaves that could not be fetched.
+    """
+    store = store or default_store()
+    todo = [p for p in dict.fromkeys(page_ids) if store.get(p, scale) is None]
+    fetcher = Fetcher(rate)
+
+    def download(page_id, scale):
+        url = url_template.format(
+            n=leaf_to_page_n(page_id), page_id=page_id, scale=scale
+        )
+        print(f"  Downloading {page_id} (scale={scale})...")
+        return fetcher.get(url)
+
+    def job(page_id):
+        store.fetch_bytes(page_id, scale, download)
+
+    downloaded, failed = [], {}
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        futures = {page_id: ex.submit(job, page_id) for page_id in todo}
+        for page_id, fut in futures.items():
+            try:
+                fut.result()
+                downloaded.append(page_id)
+            except OSError as e:
+                failed[page_id] = str(e)
+    return downloaded, failed
+
+
+def main():
+    args = sys.argv[1:]
+    options = {"--scale": 2, "--workers": DEFAULT_WORKERS, "--rate": DEFAULT_RATE}
+    pages = []
+    i = 0
+    while i < len(args):
+        if args[i] in options:
+            # Each option keeps its default's type: --scale and --workers
+            # are ints ("1.5" is an error, not silently truncated).
+            kind = type(options[args[i]])
+            try:
+                options[args[i]] = kind(args[i + 1])
+            except (IndexError, ValueError):
+                what = "an integer" if kind is int else "a number"
+                print(f"ERROR: {args[i]} needs {what}")
+                sys.exit(1)
+            i += 2
+        else:
+            pages.append(args[i])
+            i += 1
+    pages = pages or ALL_PAGES
+
+    t0 = time.perf_counter()
+    downloaded, failed = prefetch(
+        pages,
+        scale=options["--scale"],
+        max_workers=options["--workers"],
+        rate=options["--rate"],
+    )
+    n_cached = len(pages) - len(downloaded) - len(failed)
+    print(
+        f"Downloaded {len(downloaded)}, already cached {n_cached}, "
+        f"failed {len(failed)} ({time.perf_counter() - t0:.1f}s)"
+    )
+    for page_id, err in failed.items():
+        print(f"  ERROR: {page_id}: {err}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Watch the annotation files and rebuild what depends on them.
+
+Polls three places and, for each file that changed, does only the work
+for that page:
+
+  .novc/edited_<page>.json       merge its line markers into the page's
+                                 line-break file, then as below
+  py_ac_loc/line-breaks/*.json   re-check (only the changed page is
+                                 re-checked and re-aligned, the rest comes
+                                 from the checker's caches), rewrite the
+                                 report and regenerate both column editors
+  py_ac_loc/column-coordinates/  regenerate the page's column-location
+                                 editor
+
+Everything runs in this one process, so modules, the MAM-XML data and
+the per-page caches stay loaded between events (the checker and the
+word aligner keep their caches in memory and re-read the pickles only if
+another process rewrote them). A file is acted on once
+its size and mtime have been stable for one poll, so a half-written
+export is not picked up. Errors are printed and the watch goes on.
+
+Usage:
+    python py_ac_loc/watch_line_breaks.py
+    python py_ac_loc/watch_line_breaks.py --interval 0.5
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from py_ac_loc.check_line_breaks import run_check
+from py_ac_loc.gen_col_location_editor import COORD_DIR, generate_editor
+from py_ac_loc.gen_line_break_editor import generate_editor_html
+from py_ac_loc.merge_line_markers import LB_DIR, NOVC_DIR, merge_page
+
+DEFAULT_INTERVAL = 0.25  # seconds between polls
+
+
+def _snapshot():
+    """Return {path: (kind, page_id, (mtime_ns, size))} for watched files."""
+    sources = (
+        ("edited", NOVC_DIR, "edited_*.json"),
+        ("line-breaks", LB_DIR, "*.json"),
+        ("coords", COORD_DIR, "*.json"),
+    )
+    snap = {}
+    for kind, folder, pattern in sources:
+        for path in folder.glob(pattern):
+            try:
+                st = path.stat()
+            except OSError:
+                continue  # removed between glob and stat
+            page_id = path.stem
+            if kind == "edited":
+                page_id = page_id[len("edited_") :]
+            snap[path] = (kind, page_id, (st.st_mtime_ns, st.st_size))
+    return snap
+
+
+def _on_line_breaks(page_id):
+    run_check(sorted(LB_DIR.glob("*.json")), open_browser=False)
+    for col in (1, 2):
+        generate_editor_html(page_id, col)
+
+
+def _handle(kind, page_id):
+    """Do the work for one changed file."""
+    if kind == "edited":
+        merge_page(page_id)
+        _on_line_breaks(page_id)
+    elif kind == "line-breaks":
+        _on_line_breaks(page_id)
+    else:
+        generate_editor(page_id, open_browser=False)
+
+
+def watch(interval=DEFAULT_INTERVAL):
+    """Poll the watched folders every *interval* seconds until interrupted."""
+    seen = _snapshot()  # stamps already acted on (or present at start)
+    pending = {}  # path -> stamp seen on the previous poll, not yet acted on
+    print(f"Watching {len(seen)} file(s); Ctrl-C to stop")
+    while True:
+        time.sleep(interval)
+        snap = _snapshot()
+        for path, (kind, page_id, stamp) in sorted(snap.items()):
+            if path in seen and seen[path][2] == stamp:
+                pending.pop(path, None)
+                continue
+            if pending.get(path) != stamp:
+                pending[path] = stamp  # wait one poll for writes to settle
+                continue
+            del pending[path]
+            seen[path] = (kind, page_id, stamp)
+            print(f"\n== {path.relative_to(LB_DIR.parent.parent)} changed")
+            t0 = time.perf_counter()
+            try:
+                _handle(kind, page_id)
+            except (Exception, SystemExit) as exc:
+                print(f"ERROR: {kind} {page_id}: {exc!r}")
+            print(f"== done in {time.perf_counter() - t0:.2f}s")
+            # The merge rewrote the line-break file; don't handle it twice.
+            if kind == "edited":
+                lb_path = LB_DIR / f"{page_id}.json"
+                if lb_path.exists():
+                    st = lb_path.stat()
+                    stamp = (st.st_mtime_ns, st.st_size)
+                    seen[lb_path] = ("line-breaks", page_id, stamp)
+        for path in set(seen) - set(snap):
+            del seen[path]
+
+
+def main():
+    args = sys.argv[1:]
+    interval = DEFAULT_INTERVAL
+    if "--interval" in args:
+        interval = float(args[args.index("--interval") + 1])
+    try:
+        watch(interval)
+    except KeyboardInterrupt:
+        print("\nStopped")
+
+
+if __name__ == "__main__":
+    main()
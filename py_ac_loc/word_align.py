@@ -0,0 +1,455 @@
+"""
+Word-level alignment of the line-break pages against the MAM-XML text.
+
+diff_opcodes() is Myers' O((N+M)D) shortest-edit-script algorithm over
+integer token ids, so aligning the ~8,500 words of the annotated pages
+against MAM-XML costs little more than one pass when they mostly agree.
+It returns difflib-style opcodes (tag, i1, i2, j1, j2) turning the page
+words (a) into the MAM words (b):
+
+  delete   a[i1:i2] is in the pages but not in MAM-XML (an extra word)
+  insert   b[j1:j2] is in MAM-XML but missing from the pages
+  replace  a[i1:i2] stands where MAM-XML has b[j1:j2]
+
+align_pages() aligns a sequence of pages and blames each discrepancy on a
+page, column and line. MAM words before the first and after the last
+page word are free (the MAM stream covers whole verses), so the first
+and last runs of pages are aligned semi-globally. Results are cached
+per page in .novc/word-align-cache.pickle with the MAM span each page
+aligned to; on the next run, only runs of changed pages are re-aligned,
+against the MAM window between their unchanged neighbours.
+"""
+
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+CACHE_PATH = (
+    Path(__file__).resolve().parent.parent / ".novc" / "word-align-cache.pickle"
+)
+CACHE_VERSION = 2  # 2: real free ends (earlier spans could be off)
+
+
+def _myers_trace(a, b):
+    """Forward pass of Myers' algorithm; returns the V snapshots per d."""
+    n, m = len(a), len(b)
+    max_d = n + m
+    off = max_d + 1
+    v = [0] * (2 * max_d + 3)
+    trace = []
+    for d in range(max_d + 1):
+        # Snapshot of V for k in [-d-1, d+1], as needed to backtrack step d
+        trace.append(v[off - d - 1 : off + d + 2])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[off + k - 1] < v[off + k + 1]):
+                x = v[off + k + 1]  # down: b[y] is inserted
+            else:
+                x = v[off + k - 1] + 1  # right: a[x] is deleted
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[off + k] = x
+            if x >= n and y >= m:
+                return trace
+    return trace
+
+
+def _myers_moves(a, b):
+    """Return ("equal"|"delete"|"insert", i, j) moves from (0, 0) to the end."""
+    trace = _myers_trace(a, b)
+    moves = []
+    x, y = len(a), len(b)
+    for d in range(len(trace) - 1, -1, -1):
+        snap = trace[d]
+        k = x - y
+        if k == -d or (k != d and snap[k - 1 + d + 1] < snap[k + 1 + d + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = snap[prev_k + d + 1]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            moves.append(("equal", x, y))
+        if d > 0:
+            if x == prev_x:
+                moves.append(("insert", x, prev_y))
+            else:
+                moves.append(("delete", prev_x, y))
+            x, y = prev_x, prev_y
+    moves.reverse()
+    return moves
+
+
+def _semi_global_step(prev, k, n, m, off):
+    """Best way onto diagonal k from the previous step's V, or (-1, None).
+
+    Returns (x, how): x before the snake, how "stay" (already there at
+    the previous cost), "insert" (down from k + 1) or "delete" (right
+    from k - 1).
+    """
+    x, how = prev[k + off], "stay"
+    if k < n:
+        xd = prev[k + 1 + off]
+        if xd > x and xd - k <= m:
+            x, how = xd, "insert"
+    if k > -m:
+        xr = prev[k - 1 + off]
+        if xr >= 0 and xr + 1 <= n and xr + 1 > x:
+            x, how = xr + 1, "delete"
+    return x, how
+
+
+def _semi_global_moves(a, b, free_start, free_end):
+    """Like _myers_moves, but b words before/after the alignment are free.
+
+    With *free_start*, the alignment may begin at any b word at no cost
+    (every diagonal k <= 0 starts at d = 0); with *free_end*, it ends as
+    soon as a is used up. Skipped b words produce no moves. Every
+    diagonal is kept at every step, so this is O((N+M)D) in time and
+    space; it is only used for the free ends of align_pages.
+    """
+    n, m = len(a), len(b)
+    off = m  # V index of diagonal k (x - y) is k + off
+    lo = -m if free_start else 0
+
+    def snake(x, k):
+        y = x - k
+        while x < n and y < m and a[x] == b[y]:
+            x += 1
+            y += 1
+        return x
+
+    def end_diagonal(v):
+        if free_end:
+            # Of the diagonals that used up a, the one using least of b.
+            for k in range(n, -m - 1, -1):
+                if v[k + off] == n:
+                    return k
+            return None
+        return n - m if v[n - m + off] == n else None
+
+    v = [-1] * (n + m + 1)
+    for k in range(lo, 1):
+        v[k + off] = snake(0, k)
+    trace = [v]
+    end_k = end_diagonal(v)
+    while end_k is None:
+        prev, d = v, len(trace)
+        v = list(prev)
+        for k in range(max(-m, lo - d), min(n, d) + 1):
+            x, how = _semi_global_step(prev, k, n, m, off)
+            if how != "stay":
+                v[k + off] = snake(x, k)
+        trace.append(v)
+        end_k = end_diagonal(v)
+
+    moves = []
+    k, x = end_k, n
+    for d in range(len(trace) - 1, 0, -1):
+        prev = trace[d - 1]
+        start, how = _semi_global_step(prev, k, n, m, off)
+        if how == "stay" or trace[d][k + off] == prev[k + off]:
+            continue  # reached on this diagonal at a lower cost
+        while x > start:
+            x -= 1
+            moves.append(("equal", x, x - k))
+        if how == "insert":
+            k += 1
+            moves.append(("insert", x, x - k))
+        else:
+            k -= 1
+            x -= 1
+            moves.append(("delete", x, x - k))
+    while x > 0:  # the snake from the start point (0, -k)
+        x -= 1
+        moves.append(("equal", x, x - k))
+    moves.reverse()
+    return moves
+
+
+def diff_opcodes(a, b, free_start=False, free_end=False):
+    """Shortest edit script from sequence *a* to *b* as difflib opcodes.
+
+    Args:
+        a, b: sequences of hashable tokens (ideally ints).
+        free_start, free_end: if set, b words before (after) the
+            alignment cost nothing (a semi-global alignment, for a page
+            run that starts or ends mid-way through the b words); they
+            are left out of the opcodes.
+
+    Returns:
+        list of (tag, i1, i2, j1, j2) covering both sequences in order
+        (b only between the free ends); tag is "equal", "delete",
+        "insert" or "replace" (a delete run directly followed or
+        preceded by an insert run).
+    """
+    # Common prefix and suffix cost nothing; strip them before Myers. At
+    # a free end they must not be anchored: the same words may also
+    # occur further in, where the alignment really starts (or ends).
+    n, m = len(a), len(b)
+    pre = 0
+    while not free_start and pre < n and pre < m and a[pre] == b[pre]:
+        pre += 1
+    suf = 0
+    while (
+        not free_end
+        and suf < n - pre
+        and suf < m - pre
+        and a[n - 1 - suf] == b[m - 1 - suf]
+    ):
+        suf += 1
+
+    ops = []
+    if pre:
+        ops.append(["equal", 0, pre, 0, pre])
+    if free_start or free_end:
+        moves = _semi_global_moves(
+            a[pre : n - suf], b[pre : m - suf], free_start, free_end
+        )
+    else:
+        moves = _myers_moves(a[pre : n - suf], b[pre : m - suf])
+    for tag, i, j in moves:
+        i += pre
+        j += pre
+        di, dj = (0, 1) if tag == "insert" else (1, 0) if tag == "delete" else (1, 1)
+        last = ops[-1] if ops else None
+        if last and last[0] == tag:
+            last[2] += di
+            last[4] += dj
+        elif last and {last[0], tag} <= {"delete", "insert", "replace"}:
+            last[0] = "replace"
+            last[2] += di
+            last[4] += dj
+        else:
+            ops.append([tag, i, i + di, j, j + dj])
+    if suf:
+        ops.append(["equal", n - suf, n, m - suf, m])
+    return [tuple(op) for op in ops]
+
+
+def _split_by_page(ops, bounds):
+    """Split run-level opcodes at page boundaries.
+
+    Args:
+        ops: opcodes with run-relative i and absolute j.
+        bounds: cumulative word offsets of the run's pages, [0, ..., N].
+
+    Returns:
+        list, per page, of (span, ops) where span is the (start, end) MAM
+        range aligned to the page and ops have page-relative i. b-only
+        words at a page boundary belong to the following page.
+    """
+    n_pages = len(bounds) - 1
+    per_page = [[] for _ in range(n_pages)]
+    spans = [None] * n_pages
+    p = 0
+
+    def page_of(i):
+        nonlocal p
+        while p < n_pages - 1 and i >= bounds[p + 1]:
+            p += 1
+        return p
+
+    for tag, i1, i2, j1, j2 in ops:
+        if tag == "insert":
+            pg = page_of(i1) if i1 < bounds[-1] else n_pages - 1
+            per_page[pg].append((tag, i1, i1, j1, j2))
+            continue
+        while i1 < i2:
+            pg = page_of(i1)
+            cut = min(i2, bounds[pg + 1])
+            if tag == "equal":
+                j_cut = j1 + (cut - i1)
+            elif tag == "replace":
+                j_cut = j2  # all b words go with the first part
+            else:
+                j_cut = j1
+            per_page[pg].append((tag, i1, cut, j1, j_cut))
+            i1, j1 = cut, j_cut
+            if tag == "replace" and i1 < i2:
+                tag = "delete"
+
+    result = []
+    for pg in range(n_pages):
+        page_ops = per_page[pg]
+        base = bounds[pg]
+        if page_ops:
+            span = (page_ops[0][3], page_ops[-1][4])
+        else:
+            span = None  # filled below from the neighbours
+        spans[pg] = span
+        result.append(
+            [(t, i1 - base, i2 - base, j1, j2) for t, i1, i2, j1, j2 in page_ops]
+        )
+    # Pages with no words occupy an empty span where the previous one ended.
+    last_end = ops[0][3] if ops else None
+    for pg in range(n_pages):
+        if spans[pg] is None:
+            spans[pg] = (last_end, last_end)
+        last_end = spans[pg][1]
+    return list(zip(spans, result))
+
+
+# (stamp, data) of CACHE_PATH as last read or written by this process;
+# reused while the file is unchanged (e.g. between watch_line_breaks
+# events). The data is never modified in place.
+_cache = None
+
+
+def _cache_stamp():
+    try:
+        st = CACHE_PATH.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _read_cache():
+    global _cache
+    stamp = _cache_stamp()
+    if _cache is not None and stamp is not None and _cache[0] == stamp:
+        return _cache[1]
+    try:
+        with open(CACHE_PATH, "rb") as f:
+            data = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+    if data.get("version") != CACHE_VERSION:
+        return None
+    _cache = (stamp, data)
+    return data
+
+
+def _write_cache(data):
+    global _cache
+    CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_PATH.parent, prefix=CACHE_PATH.name + ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, CACHE_PATH)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    _cache = (_cache_stamp(), data)
+
+
+def align_pages(pages, mam_key, load_mam_words, use_cache=True):
+    """Align page words to MAM-XML words, re-aligning only changed pages.
+
+    Args:
+        pages: list, in codex order, of dicts with "name", "sha256",
+            "words" (word strings) and "locs" ((col, line_num) per word).
+        mam_key: any picklable value identifying the MAM word stream
+            (e.g. its verse range and source file stamps).
+        load_mam_words: callable returning the MAM word list; only called
+            when *mam_key* differs from the cached one.
+        use_cache: if False, align everything and leave the cache alone.
+
+    Returns:
+        (discrepancies, n_realigned): discrepancies in page order, each a
+        dict with "page", "tag" (delete/insert/replace, see module
+        docstring), "col", "line", "json_words" and "mam_words"; and the
+        number of pages that were re-aligned.
+    """
+    cache = _read_cache() if use_cache else None
+    if cache is not None and cache["mam_key"] == mam_key:
+        mam_words = cache["mam_words"]
+        cached_pages = cache["pages"]
+    else:
+        mam_words = load_mam_words()
+        cached_pages = {}
+
+    # A cached page is reusable if its content is unchanged and, when the
+    # previous page is reused too, its MAM span starts where that one's
+    # ended (otherwise a page between them was removed).
+    n = len(pages)
+    entries = [None] * n
+    prev_end = None
+    for pi, page in enumerate(pages):
+        hit = cached_pages.get(page["name"])
+        if hit is not None and hit["sha256"] == page["sha256"]:
+            if prev_end is None or hit["span"][0] == prev_end:
+                entries[pi] = hit
+        prev_end = entries[pi]["span"][1] if entries[pi] else None
+
+    n_realigned = 0
+    pi = 0
+    while pi < n:
+        if entries[pi] is not None:
+            pi += 1
+            continue
+        pj = pi
+        while pj < n and entries[pj] is None:
+            pj += 1
+        # Pages pi..pj-1 changed: align them against the MAM window
+        # between their unchanged neighbours.
+        w0 = entries[pi - 1]["span"][1] if pi > 0 else 0
+        w1 = entries[pj]["span"][0] if pj < n else len(mam_words)
+        ids = {}
+        run_words = [w for page in pages[pi:pj] for w in page["words"]]
+        a = [ids.setdefault(w, len(ids)) for w in run_words]
+        b = [ids.setdefault(w, len(ids)) for w in mam_words[w0:w1]]
+        ops = [
+            (t, i1, i2, j1 + w0, j2 + w0)
+            for t, i1, i2, j1, j2 in diff_opcodes(
+                a, b, free_start=pi == 0, free_end=pj == n
+            )
+        ]
+        bounds = [0]
+        for page in pages[pi:pj]:
+            bounds.append(bounds[-1] + len(page["words"]))
+        for pk, (span, page_ops) in enumerate(_split_by_page(ops, bounds), pi):
+            page = pages[pk]
+            if span[0] is None:
+                span = (w0, w0)
+            entries[pk] = {
+                "sha256": page["sha256"],
+                "span": span,
+                "diffs": [
+                    (
+                        t,
+                        i1,
+                        tuple(page["words"][i1:i2]),
+                        tuple(mam_words[j1:j2]),
+                    )
+                    for t, i1, i2, j1, j2 in page_ops
+                    if t != "equal"
+                ],
+            }
+        n_realigned += pj - pi
+        pi = pj
+
+    if use_cache and (n_realigned or cache is None):
+        _write_cache(
+            {
+                "version": CACHE_VERSION,
+                "mam_key": mam_key,
+                "mam_words": mam_words,
+                "pages": {
+                    **cached_pages,
+                    **{p["name"]: e for p, e in zip(pages, entries)},
+                },
+            }
+        )
+
+    discrepancies = []
+    for page, entry in zip(pages, entries):
+        locs = page["locs"]
+        for tag, i1, json_words, mam_words_ in entry["diffs"]:
+            col, line = locs[min(i1, len(locs) - 1)] if locs else (None, None)
+            discrepancies.append(
+                {
+                    "page": page["name"],
+                    "tag": tag,
+                    "col": col,
+                    "line": line,
+                    "json_words": list(json_words),
+                    "mam_words": list(mam_words_),
+                }
+            )
+    return discrepancies, n_realigned
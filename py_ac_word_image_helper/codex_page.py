@@ -2,72 +2,41 @@
 """Aleppo Codex page utilities: index, download, bounding boxes."""
 
 import json
-from io import BytesIO
 from pathlib import Path
-from urllib.request import urlopen
 
 from PIL import Image
 
+from py_ac_loc import image_store
+from py_ac_loc.codex_index import load_codex_index
+
 ROOT = Path(__file__).resolve().parent.parent
 LB_DIR = ROOT / "py_ac_loc" / "line-breaks"
 CC_DIR = ROOT / "py_ac_loc" / "column-coordinates"
-INDEX_PATH = ROOT / "py_ac_loc" / "codex-index" / "index-flat.json"
 CACHE_DIR = ROOT / ".novc"
 
 
-def _leaf_to_page_n(page_id):
-    num = int(page_id[:-1])
-    side = page_id[-1]
-    return (num - 1) * 2 + 2 + (0 if side == "r" else 1)
+def image_url(page_id, scale=2):
+    return image_store.image_url(page_id, scale)
 
 
-def image_url(page_id, scale=2):
-    n = _leaf_to_page_n(page_id)
-    return (
-        "https://ia601801.us.archive.org/BookReader/BookReaderImages.php"
-        f"?zip=/7/items/aleppo-codex/Aleppo%20Codex_jp2.zip"
-        f"&file=Aleppo%20Codex_jp2/Aleppo%20Codex_{n:04d}.jp2"
-        f"&id=aleppo-codex&scale={scale}&rotate=0"
-    )
+def use_jp2_zip(zip_path):
+    """Read page images from a local "Aleppo Codex_jp2.zip" (offline)."""
+    image_store.use_jp2_zip(zip_path)
 
 
 def load_index():
-    """Load page index: returns list of (leaf, ch_start, v_start, ch_end, v_end)."""
-    with open(INDEX_PATH, encoding="utf-8") as f:
-        data = json.load(f)
-    pages = []
-    for entry in data["body"]:
-        leaf = entry["de_leaf"]
-        tr = entry["de_text_range"]
-        # tr = [["Job", ch, v], ["Job", ch, v]]
-        if tr[0][0] != "Job" and tr[1][0] != "Job":
-            continue
-        # Start
-        if tr[0][0] == "Job":
-            ch_s, v_s = tr[0][1], tr[0][2]
-        else:
-            ch_s, v_s = 1, 1  # Page starts before Job
-        # End (exclusive)
-        if tr[1][0] == "Job":
-            ch_e, v_e = tr[1][1], tr[1][2]
-        else:
-            ch_e, v_e = 99, 99  # Page extends past Job
-        pages.append((leaf, ch_s, v_s, ch_e, v_e))
-    return pages
-
-
-def find_page_for_verse(pages, ch, v):
-    """Find which page a verse is on."""
-    for leaf, ch_s, v_s, ch_e, v_e in pages:
-        start_ok = (ch, v) >= (ch_s, v_s)
-        end_ok = (ch, v) < (ch_e, v_e)
-        if start_ok and end_ok:
-            return leaf
-    # Could be the last word of a page (at the boundary)
-    for leaf, ch_s, v_s, ch_e, v_e in pages:
-        if (ch, v) >= (ch_s, v_s) and (ch, v) <= (ch_e, v_e):
-            return leaf
-    return None
+    """Load the page index as a CodexIndex (all leaves, all books)."""
+    return load_codex_index()
+
+
+def find_pages_for_verse(index, ch, v, book="Job"):
+    """Find every page a verse is on (two for a verse split by a page break)."""
+    return index.leaves_for_verse(book, ch, v)
+
+
+def find_page_for_verse(index, ch, v, book="Job"):
+    """Find which page a verse is on (the later page for a split verse)."""
+    return index.find_leaf_for_verse(book, ch, v)
 
 
 def get_line_bbox(page_id, col, line_num, buffer_lines=2):
@@ -110,14 +79,19 @@ def get_line_bbox(page_id, col, line_num, buffer_lines=2):
 
 
 def download_page(page_id, scale=2):
-    """Download page image from archive.org. Returns PIL Image."""
-    url = image_url(page_id, scale=scale)
-    cache_path = CACHE_DIR / f"page_cache_{page_id}_s{scale}.jpg"
-    if cache_path.exists():
-        print(f"  Using cached {cache_path.name}")
-        return Image.open(cache_path)
-    print(f"  Downloading {page_id} (scale={scale})...")
-    data = urlopen(url).read()
-    img = Image.open(BytesIO(data))
-    img.save(cache_path, "JPEG")
-    return img
+    """Get a page image from the shared image store (downloading on a miss).
+
+    The store keeps the server's original JPEG bytes; the returned image
+    is opened lazily from them, so pixels are only decoded when first
+    used (e.g. by crop() or load()). A coarser scale is derived by the
+    store from a finer cached one (decoded in JPEG draft mode), so ask
+    for the scale you need rather than shrinking a larger image.
+
+    Args:
+        page_id: leaf identifier, e.g. "270r".
+        scale: archive.org scale (1 = full size, 2 = half, ...).
+
+    Returns:
+        PIL Image.
+    """
+    return Image.open(image_store.default_store().fetch(page_id, scale))
@@ -0,0 +1,149 @@
+"""Approximate (edit-distance) word search over the line-break pages.
+
+Queries from OCR or other editions often differ from the MAM text by a
+letter or two, so an exact or stripped match finds nothing. This module
+indexes the distinct letter skeletons (hebrew_norm "letters" level: no
+marks, no maqaf/paseq/sof pasuq) of every word in the word index by
+their padded bigrams. A query of length n within edit distance k of a
+skeleton shares at least n + 1 - 2k bigrams with it (the q-gram lemma),
+so only skeletons passing that count filter, and within k in length,
+get a real Levenshtein check. Very short queries, where the lemma
+filters nothing, are checked against the length buckets directly.
+
+    hits = fuzzy_find("ויאמר", max_dist=1)
+    for dist, skeleton, locations in hits: ...
+
+Locations are word_index tuples (leaf, col, line_num, word_idx,
+verse_label).
+"""
+
+from collections import Counter
+
+from py_ac_loc.hebrew_norm import normalize
+
+from .word_index import load_word_index
+
+LEVEL = "letters"
+Q = 2
+_PAD = "\x02"  # padding character, not Hebrew
+
+_memo = None  # (WordIndex, FuzzyIndex) for this process
+
+
+def _grams(s):
+    padded = _PAD * (Q - 1) + s + _PAD * (Q - 1)
+    return [padded[i : i + Q] for i in range(len(padded) - Q + 1)]
+
+
+def levenshtein(a, b, max_dist=None):
+    """Edit distance between *a* and *b*.
+
+    Args:
+        a, b: strings.
+        max_dist: if given, stop early and return max_dist + 1 as soon as
+            the distance is known to exceed it.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if max_dist is not None and len(a) - len(b) > max_dist:
+        return max_dist + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if max_dist is not None and min(cur) > max_dist:
+            return max_dist + 1
+        prev = cur
+    return prev[-1]
+
+
+class FuzzyIndex:
+    """Bigram index over the distinct letter skeletons of a WordIndex."""
+
+    def __init__(self, word_index):
+        self.word_index = word_index
+        self.keys = [k for k in word_index.maps[LEVEL] if k]
+        self.postings = {}  # bigram -> list of (key id, occurrences in key)
+        self.by_length = {}  # skeleton length -> list of key ids
+        for kid, key in enumerate(self.keys):
+            self.by_length.setdefault(len(key), []).append(kid)
+            for g, mult in Counter(_grams(key)).items():
+                self.postings.setdefault(g, []).append((kid, mult))
+
+    def _candidates(self, query, max_dist):
+        n = len(query)
+        lengths = range(max(1, n - max_dist), n + max_dist + 1)
+        threshold = n + Q - 1 - Q * max_dist
+        if threshold <= 0:
+            # Too short for the count filter to exclude anything.
+            return [kid for ln in lengths for kid in self.by_length.get(ln, [])]
+        counts = Counter()  # key id -> bigrams shared with the query
+        for g, q_mult in Counter(_grams(query)).items():
+            for kid, mult in self.postings.get(g, ()):
+                counts[kid] += min(q_mult, mult)
+        keys = self.keys
+        return [
+            kid
+            for kid, c in counts.items()
+            if c >= threshold and abs(len(keys[kid]) - n) <= max_dist
+        ]
+
+    def search(self, word, max_dist=2, limit=20):
+        """Return skeletons within *max_dist* edits of *word*, best first.
+
+        Args:
+            word: query word (pointed or not).
+            max_dist: maximum Levenshtein distance between skeletons.
+            limit: maximum number of skeletons returned.
+
+        Returns:
+            list of (distance, skeleton, locations), sorted by distance,
+            then by descending number of occurrences.
+        """
+        query = normalize(word, LEVEL)
+        if not query:
+            return []
+        maps = self.word_index.maps[LEVEL]
+        hits = []
+        for kid in self._candidates(query, max_dist):
+            key = self.keys[kid]
+            d = levenshtein(query, key, max_dist)
+            if d <= max_dist:
+                hits.append((d, -len(maps[key]), key))
+        hits.sort()
+        return [(d, key, maps[key]) for d, _, key in hits[:limit]]
+
+
+def load_fuzzy_index():
+    """Return the FuzzyIndex for the current word index (memoized)."""
+    global _memo
+    word_index = load_word_index()
+    if _memo is None or _memo[0] is not word_index:
+        _memo = (word_index, FuzzyIndex(word_index))
+    return _memo[1]
+
+
+def fuzzy_find(word, max_dist=2, limit=20, verse_label=None):
+    """Approximate lookup of *word* across all line-break pages.
+
+    Args:
+        word: query word.
+        max_dist: maximum edit distance between letter skeletons.
+        limit: maximum number of skeletons returned.
+        verse_label: if given (e.g. "Job 38:1"), keep only locations in
+            that verse, and drop skeletons left with none.
+
+    Returns:
+        list of (distance, skeleton, locations); see FuzzyIndex.search.
+    """
+    hits = load_fuzzy_index().search(
+        word, max_dist, limit if verse_label is None else None
+    )
+    if verse_label is not None:
+        hits = [
+            (d, key, [loc for loc in locs if loc[4] == verse_label])
+            for d, key, locs in hits
+        ]
+        hits = [h for h in hits if h[2]][:limit]
+    return hits
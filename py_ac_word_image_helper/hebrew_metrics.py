@@ -3,17 +3,16 @@
 
 import unicodedata
 
+from py_ac_loc.hebrew_norm import normalize
+
 
 def strip_heb(s):
-    """Strip cantillation marks, vowels, and format chars from Hebrew text for matching."""
-    out = []
-    for ch in s:
-        cat = unicodedata.category(ch)
-        # Keep letters (Lo) and punctuation (Po for maqaf etc.),
-        # skip Mn (marks) and Cf (format chars like ZWJ U+200D)
-        if cat not in ("Mn", "Cf"):
-            out.append(ch)
-    return "".join(out)
+    """Strip cantillation marks, vowels, and format chars from Hebrew text for matching.
+
+    Same as hebrew_norm.normalize(s, "consonantal"): table-driven and
+    memoized per distinct word.
+    """
+    return normalize(s, "consonantal")
 
 
 def join_maqaf(words):
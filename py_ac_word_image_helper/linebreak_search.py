@@ -1,176 +1,219 @@
 # Initially generated by GitHub Copilot.
 """Search for words in Aleppo Codex line-break data."""
 
-import json
 from pathlib import Path
 
+from py_ac_loc.line_break_page import load_page
+
 from .hebrew_metrics import strip_heb
 
 ROOT = Path(__file__).resolve().parent.parent
 LB_DIR = ROOT / "py_ac_loc" / "line-breaks"
 
+MAQAF = "־"
+
+
+class _Matcher:
+    """Match state for one (verse, consensus) query while walking a page."""
+
+    __slots__ = (
+        "consensus",
+        "stripped",
+        "stripped_no_maqaf",
+        "has_maqaf",
+        "has_space",
+        "recent_words",
+        "recent_words_sp",
+        "match_count",
+        "target_col",
+        "target_line",
+    )
+
+    def __init__(self, consensus):
+        self.consensus = consensus
+        self.stripped = strip_heb(consensus)
+        self.stripped_no_maqaf = (
+            strip_heb(consensus[:-1]) if consensus.endswith(MAQAF) else None
+        )
+        # Consensus with maqaf or a space spans several line-break words
+        self.has_maqaf = MAQAF in consensus
+        self.has_space = " " in consensus
+        self.recent_words = []  # buffer of recent words for maqaf joining
+        self.recent_words_sp = []  # buffer of recent words for space joining
+        self.match_count = 0  # count matches to detect ambiguity
+        self.target_col = None
+        self.target_line = None
+
+    def matches(self, word, word_stripped):
+        return (
+            word == self.consensus
+            or word_stripped == self.stripped
+            or word_stripped == self.stripped_no_maqaf
+        )
 
-def find_word_in_linebreaks(page_id, ch, v, consensus):
-    """Find a word in the line-break data.
-
-    Returns (col, line_num, word_index_in_line, line_words)
-    where line_words is the list of all words on that line.
+    def _hit(self, col, line):
+        self.match_count += 1
+        if self.match_count == 1:
+            self.target_col, self.target_line = col, line
+
+    def feed(self, item, col, line):
+        """Consume one word of the verse, found on (col, line)."""
+        item_stripped = strip_heb(item)
+        if self.matches(item, item_stripped):
+            self._hit(col, line)
+            return
+
+        # Try joining recent maqaf-ending words with the current word
+        if self.has_maqaf:
+            recent = self.recent_words
+            recent.append(item)
+            joined = "".join(recent)
+            joined_stripped = "".join(map(strip_heb, recent))
+            if joined_stripped == self.stripped or joined == self.consensus:
+                self._hit(col, line)
+                return
+            # If joined doesn't start the consensus, trim from the left
+            while recent and not self.stripped.startswith(
+                "".join(map(strip_heb, recent))
+            ):
+                recent.pop(0)
+
+        # Try joining recent words with spaces
+        if self.has_space:
+            recent = self.recent_words_sp
+            recent.append(item)
+            joined = " ".join(recent)
+            joined_stripped = " ".join(map(strip_heb, recent))
+            if joined_stripped == self.stripped or joined == self.consensus:
+                self._hit(col, line)
+                return
+            # Trim from front if joined can't be a prefix of consensus
+            while recent and not self.stripped.startswith(
+                " ".join(map(strip_heb, recent))
+            ):
+                recent.pop(0)
+
+    def index_in_line(self, line_words):
+        """Return the index of the first line word that starts a match."""
+        for i, w in enumerate(line_words):
+            w_stripped = strip_heb(w)
+            if self.matches(w, w_stripped):
+                return i
+            # Try joining consecutive maqaf-connected words starting at i
+            if self.has_maqaf and w.endswith(MAQAF):
+                joined = w
+                j_stripped = w_stripped
+                for j in range(i + 1, len(line_words)):
+                    joined += line_words[j]
+                    j_stripped += strip_heb(line_words[j])
+                    if j_stripped == self.stripped or joined == self.consensus:
+                        return i
+                    if not line_words[j].endswith(MAQAF):
+                        break
+            # Try joining consecutive space-separated words starting at i
+            if self.has_space:
+                joined = w
+                j_stripped = w_stripped
+                for j in range(i + 1, len(line_words)):
+                    joined += " " + line_words[j]
+                    j_stripped += " " + strip_heb(line_words[j])
+                    if j_stripped == self.stripped or joined == self.consensus:
+                        return i
+        return None
+
+
+def _scan_page(page, matchers_by_label):
+    """Feed every word of *page* to the matchers of the verse it is in.
+
+    Args:
+        page: line_break_page.Page.
+        matchers_by_label: dict verse label -> list of _Matcher.
     """
-    lb_path = LB_DIR / f"{page_id}.json"
-    with open(lb_path, encoding="utf-8") as f:
-        stream = json.load(f)
-
-    verse_label = f"Job {ch}:{v}"
-    in_verse = False
+    open_labels = []  # queried verses (or fragments) we are inside
     cur_col = None
     cur_line = None
-    word_idx = 0  # 0-based index within current line
-
-    consensus_stripped = strip_heb(consensus)
-
-    # Check if consensus contains maqaf (multi-token in line-break data)
-    MAQAF = "\u05be"
-    consensus_has_maqaf = MAQAF in consensus
-    # Check if consensus contains a space (multi-word in line-break data)
-    consensus_has_space = " " in consensus
-
-    # First pass: find which col+line the word is on.
-    target_col = None
-    target_line = None
-    match_count = 0  # count matches to detect ambiguity
-    # For maqaf-joined consensus, track the index of the first part
-    recent_words = []  # buffer of recent words for maqaf joining
-    recent_words_sp = []  # buffer of recent words for space joining
-    for item in stream:
-        if isinstance(item, dict):
-            if (
-                item.get("verse-start") == verse_label
-                or item.get("verse-fragment-start") == verse_label
-            ):
-                in_verse = True
-                recent_words = []
-                recent_words_sp = []
+    for item in page.stream:
+        if isinstance(item, str):
+            for label in open_labels:
+                for m in matchers_by_label[label]:
+                    m.feed(item, cur_col, cur_line)
+        elif isinstance(item, dict):
+            label = item.get("verse-start") or item.get("verse-fragment-start")
+            if label in matchers_by_label:
+                if label not in open_labels:
+                    open_labels.append(label)
+                for m in matchers_by_label[label]:
+                    m.recent_words = []
+                    m.recent_words_sp = []
                 continue
-            if (
-                item.get("verse-end") == verse_label
-                or item.get("verse-fragment-end") == verse_label
-            ):
-                in_verse = False
+            label = item.get("verse-end") or item.get("verse-fragment-end")
+            if label in open_labels:
+                open_labels.remove(label)
                 continue
             if "line-start" in item:
                 cur_col = item["line-start"]["col"]
                 cur_line = item["line-start"]["line-num"]
-                continue
-            if "line-end" in item:
-                continue
-        elif isinstance(item, str) and in_verse:
-            item_stripped = strip_heb(item)
-            matched = (
-                item == consensus
-                or item_stripped == consensus_stripped
-                or (
-                    consensus.endswith(MAQAF)
-                    and item_stripped == strip_heb(consensus[:-1])
-                )
-            )
-            if matched:
-                match_count += 1
-                if match_count == 1:
-                    target_col, target_line = cur_col, cur_line
-                continue
 
-            # Try joining recent maqaf-ending words with the current word
-            if consensus_has_maqaf:
-                recent_words.append(item)
-                # Keep only words that could form the start of the consensus
-                joined = "".join(recent_words)
-                joined_stripped = strip_heb(joined)
-                if joined_stripped == consensus_stripped or joined == consensus:
-                    match_count += 1
-                    if match_count == 1:
-                        target_col, target_line = cur_col, cur_line
-                    continue
-                # If joined doesn't start the consensus, trim from the left
-                while recent_words and not consensus_stripped.startswith(
-                    strip_heb("".join(recent_words))
-                ):
-                    recent_words.pop(0)
-
-            # Try joining recent words with spaces
-            if consensus_has_space:
-                recent_words_sp.append(item)
-                joined = " ".join(recent_words_sp)
-                joined_stripped = strip_heb(joined)
-                if joined_stripped == consensus_stripped or joined == consensus:
-                    match_count += 1
-                    if match_count == 1:
-                        target_col, target_line = cur_col, cur_line
-                    continue
-                # Trim from front if joined can't be a prefix of consensus
-                while recent_words_sp and not consensus_stripped.startswith(
-                    strip_heb(" ".join(recent_words_sp))
-                ):
-                    recent_words_sp.pop(0)
-
-    if match_count > 1:
-        raise ValueError(
-            f"Ambiguous: {match_count} matches for {consensus!r} "
-            f"(stripped: {consensus_stripped!r}) in {verse_label} on page {page_id}"
-        )
 
-    if target_col is None:
-        return None, None, None, []
+def find_words_in_linebreaks(queries, book="Job"):
+    """Find many words in the line-break data, one traversal per page.
 
-    # Second pass: collect all words on that line
-    in_target_line = False
-    cur_line_words = []
-    for item in stream:
-        if isinstance(item, dict):
-            if "line-start" in item:
-                ls = item["line-start"]
-                if ls["col"] == target_col and ls["line-num"] == target_line:
-                    in_target_line = True
-                    cur_line_words = []
-                continue
-            if "line-end" in item and in_target_line:
-                break
-        elif isinstance(item, str) and in_target_line:
-            cur_line_words.append(item)
-
-    # Find word index within the full line word list
-    target_word_idx = None
-    for i, w in enumerate(cur_line_words):
-        w_stripped = strip_heb(w)
-        if (
-            w == consensus
-            or w_stripped == consensus_stripped
-            or (consensus.endswith(MAQAF) and w_stripped == strip_heb(consensus[:-1]))
-        ):
-            target_word_idx = i
-            break
-        # Try joining consecutive maqaf-connected words starting at i
-        if consensus_has_maqaf and w.endswith(MAQAF):
-            joined = w
-            for j in range(i + 1, len(cur_line_words)):
-                joined += cur_line_words[j]
-                j_stripped = strip_heb(joined)
-                if j_stripped == consensus_stripped or joined == consensus:
-                    target_word_idx = i
-                    break
-                if not cur_line_words[j].endswith(MAQAF):
-                    break
-            if target_word_idx is not None:
-                break
-        # Try joining consecutive space-separated words starting at i
-        if consensus_has_space:
-            joined = w
-            for j in range(i + 1, len(cur_line_words)):
-                joined += " " + cur_line_words[j]
-                j_stripped = strip_heb(joined)
-                if j_stripped == consensus_stripped or joined == consensus:
-                    target_word_idx = i
-                    break
-            if target_word_idx is not None:
-                break
-
-    return target_col, target_line, target_word_idx, cur_line_words
+    Args:
+        queries: iterable of (page_id, ch, v, consensus) tuples, as for
+            find_word_in_linebreaks.
+        book: book name used in the verse labels, e.g. "Job".
+
+    Returns:
+        list, one (result, error) pair per query in input order. result
+        is (col, line_num, word_index_in_line, line_words), or (None,
+        None, None, []) if not found; error is None. If the word matches
+        more than once in its verse, result is None and error says so;
+        an ambiguous query does not affect the others.
+    """
+    queries = list(queries)
+    matchers = []
+    by_page = {}  # page_id -> {verse label -> [_Matcher, ...]}
+    for page_id, ch, v, consensus in queries:
+        m = _Matcher(consensus)
+        matchers.append(m)
+        label = f"{book} {ch}:{v}"
+        by_page.setdefault(page_id, {}).setdefault(label, []).append(m)
+
+    pages = {}
+    for page_id, matchers_by_label in by_page.items():
+        pages[page_id] = load_page(LB_DIR / f"{page_id}.json")
+        _scan_page(pages[page_id], matchers_by_label)
+
+    results = []
+    for (page_id, ch, v, consensus), m in zip(queries, matchers):
+        if m.match_count > 1:
+            error = (
+                f"Ambiguous: {m.match_count} matches for {consensus!r} "
+                f"(stripped: {m.stripped!r}) in {book} {ch}:{v} on page {page_id}"
+            )
+            results.append((None, error))
+            continue
+        if m.target_col is None:
+            results.append(((None, None, None, []), None))
+            continue
+        line_words = pages[page_id].line_words(m.target_col, m.target_line)
+        word_idx = m.index_in_line(line_words)
+        results.append(((m.target_col, m.target_line, word_idx, line_words), None))
+    return results
+
+
+def find_word_in_linebreaks(page_id, ch, v, consensus, book="Job"):
+    """Find a word in the line-break data.
+
+    Returns (col, line_num, word_index_in_line, line_words)
+    where line_words is the list of all words on that line.
+
+    Raises:
+        ValueError: if the word matches more than once in the verse.
+    """
+    [(result, error)] = find_words_in_linebreaks(
+        [(page_id, ch, v, consensus)], book=book
+    )
+    if error is not None:
+        raise ValueError(error)
+    return result
@@ -0,0 +1,141 @@
+"""Multi-word phrase search over the whole line-break word stream.
+
+The words of every line-break page, in codex leaf order, form one token
+stream; each word is normalized (hebrew_norm level, "letters" by
+default) and mapped to an integer id. A suffix array over that id
+sequence, built by prefix doubling, lists every suffix in sorted order,
+so all occurrences of a phrase are one contiguous block found by two
+binary searches: O(m log n) for an m-word phrase, independent of verse,
+line, column and page boundaries.
+
+    for start, end in find_phrase("וַיַּ֣עַן אִיּ֣וֹב וַיֹּאמַֽר"):
+        print(start, end)   # (leaf, col, line_num, word_idx) of first/last word
+
+Query phrases are split on spaces and after maqaf, so "כִּֽי־אָז" is the
+two stream words "כִּֽי־" and "אָז".
+"""
+
+import bisect
+
+from py_ac_loc.hebrew_norm import MAQAF, normalize
+
+from .word_index import load_word_index
+
+_memo = {}  # level -> (WordIndex, PhraseIndex) for this process
+
+
+def suffix_array(text):
+    """Return the suffix array of a sequence of non-negative ints.
+
+    Prefix doubling: suffixes are sorted by their first k symbols,
+    then by pairs of k-ranks, doubling k until all ranks are distinct.
+    """
+    n = len(text)
+    sa = list(range(n))
+    if n < 2:
+        return sa
+    rank = list(text)
+    k = 1
+    while True:
+
+        def key(i):
+            return (rank[i], rank[i + k] if i + k < n else -1)
+
+        sa.sort(key=key)
+        new_rank = [0] * n
+        for j in range(1, n):
+            prev, cur = sa[j - 1], sa[j]
+            new_rank[cur] = new_rank[prev] + (key(prev) < key(cur))
+        rank = new_rank
+        if rank[sa[-1]] == n - 1:
+            return sa
+        k *= 2
+
+
+class _SuffixView:
+    """The suffix array as a sequence of m-token prefixes, for bisect."""
+
+    def __init__(self, text, sa, m):
+        self.text, self.sa, self.m = text, sa, m
+
+    def __len__(self):
+        return len(self.sa)
+
+    def __getitem__(self, i):
+        start = self.sa[i]
+        return self.text[start : start + self.m]
+
+
+class PhraseIndex:
+    """Suffix array over the normalized word stream of all pages."""
+
+    def __init__(self, word_index, level="letters"):
+        """
+        Args:
+            word_index: word_index.WordIndex (supplies pages in codex order).
+            level: hebrew_norm match level applied to stream and queries.
+        """
+        self.level = level
+        self.ids = {}  # normalized form -> token id
+        self.text = []  # token id per stream position
+        self.locations = []  # (leaf, col, line_num, word_idx) per position
+        for leaf in word_index.leaves:
+            for word, col, line_num, word_idx, _ in word_index.pages[leaf]:
+                form = normalize(word, level)
+                if not form:
+                    continue  # e.g. a lone paseq at the "letters" level
+                self.text.append(self.ids.setdefault(form, len(self.ids)))
+                self.locations.append((leaf, col, line_num, word_idx))
+        self.sa = suffix_array(self.text)
+
+    def tokenize(self, phrase):
+        """Split *phrase* into normalized stream words."""
+        words = phrase.replace(MAQAF, MAQAF + " ").split()
+        return [f for f in (normalize(w, self.level) for w in words) if f]
+
+    def positions(self, phrase):
+        """Return the stream positions where *phrase* starts, ascending."""
+        try:
+            query = [self.ids[f] for f in self.tokenize(phrase)]
+        except KeyError:
+            return []  # some word never occurs
+        if not query:
+            return []
+        view = _SuffixView(self.text, self.sa, len(query))
+        lo = bisect.bisect_left(view, query)
+        hi = bisect.bisect_right(view, query, lo)
+        return sorted(self.sa[lo:hi])
+
+    def find(self, phrase):
+        """Return (start, end) locations of every occurrence of *phrase*.
+
+        Each location is (leaf, col, line_num, word_idx); end is the
+        location of the phrase's last word. Occurrences are in codex order.
+        """
+        m = len(self.tokenize(phrase))
+        return [
+            (self.locations[p], self.locations[p + m - 1])
+            for p in self.positions(phrase)
+        ]
+
+
+def load_phrase_index(level="letters"):
+    """Return the PhraseIndex for the current word index (memoized)."""
+    word_index = load_word_index()
+    hit = _memo.get(level)
+    if hit is None or hit[0] is not word_index:
+        hit = _memo[level] = (word_index, PhraseIndex(word_index, level))
+    return hit[1]
+
+
+def find_phrase(phrase, level="letters"):
+    """Find every occurrence of a multi-word phrase across all pages.
+
+    Args:
+        phrase: words separated by spaces and/or maqaf.
+        level: hebrew_norm match level used to compare words.
+
+    Returns:
+        list of (start, end) (leaf, col, line_num, word_idx) locations.
+    """
+    return load_phrase_index(level).find(phrase)
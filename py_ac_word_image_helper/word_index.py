@@ -0,0 +1,164 @@
+"""Global word-location index over every line-break page.
+
+Maps each word form found in py_ac_loc/line-breaks/*.json to every place
+it occurs, so a word lookup is a dict hit instead of a page scan, and the
+caller need not know the page in advance.
+
+Each location is a tuple (leaf, col, line_num, word_idx, verse_label):
+word_idx is the 0-based index within the line (as returned by
+find_word_in_linebreaks) and verse_label is e.g. "Job 38:1". col,
+line_num and word_idx are None for words not inside a line-start marker.
+
+Forms are indexed at every hebrew_norm match level ("exact", "nfc",
+"pointed", "consonantal" and "letters"). The built index is persisted in
+.novc/word-index.pickle together with the per-page word lists and each
+page file's mtime and size. When no page changed, loading just unpickles
+the index; otherwise only pages that changed or were added are re-read,
+and the maps are rebuilt from the (mostly cached) page word lists.
+"""
+
+import json
+import os
+import pickle
+from pathlib import Path
+
+from py_ac_loc.codex_index import load_codex_index
+from py_ac_loc.hebrew_norm import LEVELS, normalize
+
+ROOT = Path(__file__).resolve().parent.parent
+LB_DIR = ROOT / "py_ac_loc" / "line-breaks"
+CACHE_PATH = ROOT / ".novc" / "word-index.pickle"
+
+# Bump when page entries or WordIndex attributes change shape.
+CACHE_VERSION = 2
+
+_memo = None  # WordIndex for this process
+_pages = None  # leaf -> {"stamp", "entries"} that _memo was built from
+
+
+def page_entries(stream):
+    """Extract (word, col, line_num, word_idx, verse_label) for each word.
+
+    Args:
+        stream: flat stream list as loaded from a line-break JSON file.
+    """
+    entries = []
+    verse = None
+    col = line_num = None
+    word_idx = None
+    for item in stream:
+        if isinstance(item, str):
+            entries.append((item, col, line_num, word_idx, verse))
+            if word_idx is not None:
+                word_idx += 1
+        elif isinstance(item, dict):
+            if "verse-start" in item:
+                verse = item["verse-start"]
+            elif "verse-fragment-start" in item:
+                verse = item["verse-fragment-start"]
+            elif "verse-end" in item or "verse-fragment-end" in item:
+                verse = None
+            elif "line-start" in item:
+                col = item["line-start"]["col"]
+                line_num = item["line-start"]["line-num"]
+                word_idx = 0
+            elif "line-end" in item:
+                col = line_num = word_idx = None
+    return entries
+
+
+class WordIndex:
+    """In-memory form -> locations maps built from per-page entries."""
+
+    def __init__(self, pages):
+        """
+        Args:
+            pages: dict leaf -> list of page_entries() tuples.
+        """
+        order = {leaf: i for i, leaf in enumerate(load_codex_index().leaves)}
+        self.leaves = sorted(pages, key=lambda leaf: order.get(leaf, len(order)))
+        self.pages = pages
+        self.maps = {level: {} for level in LEVELS}
+        for leaf in self.leaves:
+            for word, col, line_num, word_idx, verse in pages[leaf]:
+                loc = (leaf, col, line_num, word_idx, verse)
+                for level in LEVELS:
+                    self.maps[level].setdefault(normalize(word, level), []).append(loc)
+
+    def lookup(self, word, level="consonantal", verse_label=None):
+        """Return every location of *word*, in codex order.
+
+        Args:
+            word: the word to look up.
+            level: one of LEVELS; both *word* and the indexed forms are
+                compared after that normalization.
+            verse_label: if given (e.g. "Job 38:1"), keep only locations
+                in that verse.
+        """
+        locs = self.maps[level].get(normalize(word, level), [])
+        if verse_label is not None:
+            locs = [loc for loc in locs if loc[4] == verse_label]
+        return locs
+
+
+def _stamp(path):
+    st = path.stat()
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _read_cache():
+    """Return (pages, WordIndex) from the pickle, or ({}, None)."""
+    try:
+        with open(CACHE_PATH, "rb") as f:
+            data = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return {}, None
+    if data.get("version") != CACHE_VERSION:
+        return {}, None
+    return data["pages"], data["index"]
+
+
+def _write_cache(pages, index):
+    CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = CACHE_PATH.with_name(f"{CACHE_PATH.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        payload = {"version": CACHE_VERSION, "pages": pages, "index": index}
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, CACHE_PATH)
+
+
+def load_word_index():
+    """Return the word index, re-reading only line-break pages that changed.
+
+    A page is re-extracted only when its file's mtime or size differs
+    from the cached stamp. If none did, the cached index (this process's,
+    else the pickled one) is returned as is; otherwise the maps are
+    rebuilt and the pickle rewritten.
+    """
+    global _memo, _pages
+    if _pages is None:
+        cached, cached_index = _read_cache()
+    else:
+        cached, cached_index = _pages, _memo
+    pages = {}
+    changed = False
+    for path in sorted(LB_DIR.glob("*.json")):
+        leaf = path.stem
+        stamp = _stamp(path)
+        hit = cached.get(leaf)
+        if hit is not None and hit["stamp"] == stamp:
+            pages[leaf] = hit
+            continue
+        stream = json.loads(path.read_text(encoding="utf-8"))
+        pages[leaf] = {"stamp": stamp, "entries": page_entries(stream)}
+        changed = True
+    if set(pages) != set(cached):
+        changed = True
+
+    if not changed and cached_index is not None:
+        _memo, _pages = cached_index, pages
+        return _memo
+    _memo = WordIndex({leaf: p["entries"] for leaf, p in pages.items()})
+    _pages = pages
+    _write_cache(pages, _memo)
+    return _memo